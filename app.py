@@ -1,44 +1,32 @@
 import streamlit as st
 import pandas as pd
-import re
-import io
-import os
-import pysrt
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.text import WD_LINE_SPACING
-from docx.enum.text import WD_TAB_ALIGNMENT
-import random
+import numpy as np
+import uuid
+import hashlib
+from collections import OrderedDict
 from datetime import datetime
-
-# --- GLOBAL CONFIGURATION (Unified) ---
-TARGET_FONT = 'Times New Roman'
-TARGET_SIZE_PT = Pt(12) 
-MAX_SPEAKER_NAME_LENGTH = 35 
-MAX_SPEAKER_NAME_WORDS = 4 
-
-# List of common non-speaker phrases (from srt-excel-converter-app.py)
-NON_SPEAKER_PHRASES = [
-    "the only problem", "note", "warning", "things", "and on the way we came across this", 
-    "this is the highest swing in europe", "and i swear", "which meant", "the only thing is", 
-    "and remember", "official distance", "first and foremost", "i said", 
-    "here we go", "next up", "step 1", "step 2", "step 3", "and step 3", "first up", 
-    "so the question is", "i was growing up", "you might be wondering", "update", 
-    "nashville to miami", "all i know is", "unlike judy", "the good news is", 
-    "aer lingus seat", "the true test is", "just as i suspected", "like i said", 
-    "star review and said", "i told them all", "and best of all", "the point is", 
-    "americans", "i was thinking", "and they go", "first of all", "second", 
-    "are you like", "as a reminder", "round 2", "round 1", "round 3", "round 4", 
-    "round 5", "welcome to round 3", "the question is", "quick reminder", 
-    "in 2nd place", "coming up", "first stop", "next step", "and that means", 
-    "hashtag", "so to be clear", "your second word", "welcome to round 6", 
-    "battle finale time", "number 1", "number 2", "but the truth is", 
-    "score to beat", "and your winner", "\"crafty\" and \"betcha\". coming up", 
-    "next one", "keep in mind", "and it says", "you could say", "welcome to round 2", 
-    "and the best part", "onto round 2", "the ride we chose", "good news is", 
-    "bad news", "good news", "he thought", "3 teams remain"
-]
+import artifacts
+import batch
+import jobs
+import profiling
+from core import (
+    CONVERSIONS, DOCX_ENGINE_PYTHON_DOCX, DOCX_ENGINE_OOXML,
+    EXPORT_FORMATS, dataframe_to_export_bytes,
+    SpeakerClassifier, parse_non_speaker_phrases, SRT_COLUMNS, SRT_MS_COLUMNS, timing_stats,
+    COMMON_FRAME_RATES, fps_scale_factor, parse_timecode, conversion_output_name, decode_text,
+    SrtRevisionTracker,
+)
+
+# Paginated preview (Excel page): rows rendered per page
+PREVIEW_PAGE_SIZES = (50, 100, 250, 500)
+DEFAULT_CELL_STYLE = 'background-color: #FFFFFF; color: #000000'
+
+# Per-session result cache limits (see ResultCache)
+SESSION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+SESSION_CACHE_MAX_ENTRIES = 32
+
+# Background jobs (SRT to Word, Word formatter): progress refresh interval while a job runs
+JOB_POLL_SECONDS = 1.0
 
 # Color palette for DataFrame preview (from srt-excel-converter-app.py)
 COLOR_PALETTE = [
@@ -53,362 +41,256 @@ COLOR_PALETTE = [
     'background-color: #8B4513; color: #FFFFFF', 'background-color: #36454F; color: #FFFFFF',
 ]
 
-# Shared Regexes for Word Formatter (from word-editor-app-app.py)
-SPEAKER_REGEX = re.compile(r"^([A-Z][a-z\s&]+):\s*", re.IGNORECASE)
-TIMECODE_REGEX = re.compile(r"^\d{2}:\d{2}:\d{2},\d{3}\s+-->\s+\d{2}:\d{2}:\d{2},\d{3}$")
-HTML_CONTENT_REGEX = re.compile(r"((?:</?[ibu]>)+)(.*?)(?:</?[ibu]>)+", re.IGNORECASE | re.DOTALL) 
-
-# Color variables for Word Formatter (from word-editor-app-app.py)
-def generate_vibrant_rgb_colors(count=150):
-    """Generates a list of highly saturated, distinct RGB colors."""
-    colors = set()
-    while len(colors) < count:
-        h = random.random(); s = 0.8; v = 0.9 
-        if s == 0.0: r = g = b = v
-        else:
-            i = int(h * 6.0); f = h * 6.0 - i; p = v * (1.0 - s); q = v * (1.0 - s * f); t = v * (1.0 - s * (1.0 - f))
-            if i % 6 == 0: r, g, b = v, t, p
-            elif i % 6 == 1: r, g, b = q, v, p
-            elif i % 6 == 2: r, g, b = p, v, t
-            elif i % 6 == 3: r, g, b = p, q, v
-            elif i % 6 == 4: r, g, b = t, p, v
-            else: r, g, b = v, p, q
-        r, g, b = int(r * 255), int(g * 255), int(b * 255)
-        if (r < 50 and g < 50 and b < 50) or (r > 200 and g > 200 and b > 200): continue 
-        colors.add((r, g, b))
-    return list(colors)
-
-FONT_COLORS_RGB_150 = generate_vibrant_rgb_colors(150)
-speaker_color_map = {}
-used_colors = []
-
-# FIX: Ensure get_speaker_color handles RGBColor objects correctly
-def get_speaker_color(speaker_name):
-    """Assigns and retrieves a unique color for a given speaker name (for Word Formatter)."""
-    global used_colors
-    global speaker_color_map
-    
-    if speaker_name not in speaker_color_map:
-        if not used_colors:
-            # Reinitialize and shuffle if exhausted
-            used_colors_raw = [RGBColor(r, g, b) for r, g, b in FONT_COLORS_RGB_150]
-            random.shuffle(used_colors_raw)
-            used_colors = used_colors_raw
-            
-        if used_colors:
-            color_object = used_colors.pop()
-            speaker_color_map[speaker_name] = color_object
-            return color_object
-        else:
-            # Fallback to black if color generation fails
-            return RGBColor(0, 0, 0)
-    
-    return speaker_color_map[speaker_name]
-
-# --- CORE LOGIC FUNCTIONS ---
+# --- PREVIEW STYLING (Excel page) ---
 
-# 1. SRT TO WORD (from srttowordapp.py)
-def set_font_and_size(run, font_name, font_size):
-    """Applies Font and Size to a specific run."""
-    run.font.name = font_name
-    run.font.size = font_size
-
-def process_srt_to_docx(uploaded_file, file_name_without_ext):
-    """Reads SRT file and converts it to DOCX with basic formatting."""
-    
-    srt_content = uploaded_file.getvalue().decode('utf-8')
-    subs = pysrt.from_string(srt_content)
-    document = Document()
-    
-    document.add_heading(f"SRT Conversion: {file_name_without_ext}", level=1)
-
-    for sub in subs:
-        # Add Index
-        p_index = document.add_paragraph(f"{sub.index}")
-        set_font_and_size(p_index.runs[0], TARGET_FONT, TARGET_SIZE_PT)
-        p_index.paragraph_format.space_after = Pt(0) 
-
-        # Add Timecode
-        timecode_str = f"{sub.start} --> {sub.end}"
-        p_timecode = document.add_paragraph(timecode_str)
-        set_font_and_size(p_timecode.runs[0], TARGET_FONT, TARGET_SIZE_PT)
-        p_timecode.paragraph_format.space_after = Pt(0)
-        
-        # Add Content (cleans up tags using pysrt)
-        p_content = document.add_paragraph(sub.text_without_tags)
-        if p_content.runs:
-            set_font_and_size(p_content.runs[0], TARGET_FONT, TARGET_SIZE_PT)
-        p_content.paragraph_format.space_after = Pt(12) 
-
-    modified_file = io.BytesIO()
-    document.save(modified_file)
-    modified_file.seek(0)
-    
-    return modified_file
-
-# 2. SRT TO EXCEL (from srt-excel-converter-app.py)
+def speaker_color_map(speakers):
+    """Maps each speaker (in order of first appearance) to a preview color style."""
+    return {
+        speaker: COLOR_PALETTE[i % len(COLOR_PALETTE)]
+        for i, speaker in enumerate(pd.unique(speakers))
+    }
 
-def clean_dialogue_text(text):
+def apply_styles(df, color_map=None):
     """
-    Converts HTML/XML style formatting tags (i, b, u) to text enclosed in parentheses ().
-    Removes any other HTML/XML tags.
+    Applies distinct background color styling and text color per speaker for DataFrame preview (for Excel page).
+    Vectorized: one Series.map over the Speaker column, broadcast to all columns. Pass color_map (built from
+    the full table) when styling a single page so colors stay stable across pages and filters.
     """
-    text = re.sub(r'<i[^>]*>(.*?)</i[^>]*>', r'(\1)', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<b[^>]*>(.*?)</b[^>]*>', r'(\1)', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<u[^>]*>(.*?)</u[^>]*>', r'(\1)', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<[^>]*>', '', text, flags=re.DOTALL)
-    return re.sub(r'\s+', ' ', text).strip()
-
-def is_valid_speaker_tag(tag):
-    """Checks if a tag is likely a speaker name using linguistic heuristics."""
-    tag = tag.strip()
-    if not tag: return False
-    if tag.lower() in NON_SPEAKER_PHRASES: return False
-    if len(tag) > MAX_SPEAKER_NAME_LENGTH: return False
-    normalized_tag = tag.replace(' and ', ' ').replace(' and', '').replace('&', ' ').strip()
-    if not normalized_tag: return False
-    word_count = len(normalized_tag.split())
-    if word_count > MAX_SPEAKER_NAME_WORDS: return False 
-    first_word = normalized_tag.split()[0] if normalized_tag.split() else normalized_tag
-    if first_word[0].isalpha() and first_word[0].islower(): return False
-    return True
-
-def parse_srt(srt_content):
-    """
-    Parses SRT content to extract Start, End timecodes, Speaker, and Dialogue 
-    (from srt-excel-converter-app.py - complex parser)
-    """
-    data = []
-    blocks = re.split(r'\n\s*\n', srt_content.strip())
-    last_known_speaker = "Unknown" 
-
-    def append_row_and_update_state(speaker, dialogue):
-        nonlocal last_known_speaker
-        # IMPORTANT: Use clean_dialogue_text to remove tags for Excel output
-        data.append([time_start, time_end, speaker, clean_dialogue_text(dialogue)]) 
-        last_known_speaker = speaker 
-
-    for block in blocks:
-        lines = block.strip().split('\n')
-        if len(lines) < 3: continue
-
-        time_line = lines[1].strip()
-        time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})', time_line)
-        if not time_match: continue
-
-        time_start = time_match.group(1) 
-        time_end = time_match.group(2)   
-
-        dialogue_lines = lines[2:]
-        current_dialogue = ""
-        block_initial_speaker = last_known_speaker
-        
-        for line in dialogue_lines:
-            line = line.strip()
-            if not line: continue
-
-            segments = re.split(r'((?:[\w\s&]+?): )', line)
-            
-            i = 0
-            while i < len(segments):
-                segment = segments[i].strip()
-                i += 1
-                
-                if not segment: continue
-
-                if segment.endswith(':') and len(segment) > 1:
-                    speaker_tag = segment[:-1].strip()
-                    
-                    if is_valid_speaker_tag(speaker_tag):
-                        
-                        if current_dialogue:
-                            speaker_to_use = block_initial_speaker if not data or data[-1][0] != time_start else last_known_speaker
-                            append_row_and_update_state(speaker_to_use, current_dialogue)
-                            current_dialogue = "" 
-                            
-                        speaker = speaker_tag
-                        dialogue_segment = segments[i].strip() if i < len(segments) else ""
-                        i += 1
-                        
-                        if dialogue_segment:
-                            append_row_and_update_state(speaker, dialogue_segment)
-                            
-                        if block_initial_speaker == last_known_speaker:
-                             block_initial_speaker = speaker
-                            
-                    else:
-                        dialogue_segment = segments[i].strip() if i < len(segments) else ""
-                        i += 1
-                        recombined_text = segment + " " + dialogue_segment
-                        
-                        if current_dialogue: current_dialogue += " " + recombined_text
-                        else: current_dialogue = recombined_text
-                        
-                else:
-                    if current_dialogue: current_dialogue += " " + segment
-                    else: current_dialogue = segment
-
-        if current_dialogue:
-            speaker_to_use = block_initial_speaker if not data or data[-1][0] != time_start else last_known_speaker
-            append_row_and_update_state(speaker_to_use, current_dialogue)
-
-    return pd.DataFrame(data, columns=['Start', 'End', 'Speaker', 'Dialogue'])
+    if color_map is None:
+        color_map = speaker_color_map(df['Speaker'])
 
-def apply_styles(df):
-    """Applies distinct background color styling and text color per speaker for DataFrame preview (for Excel page)."""
-    unique_speakers = df['Speaker'].unique()
-    color_map = {
-        speaker: COLOR_PALETTE[i % len(COLOR_PALETTE)]
-        for i, speaker in enumerate(unique_speakers)
-    }
-
-    def highlight_speaker(row):
-        color_style = color_map.get(row['Speaker'], 'background-color: #FFFFFF; color: #000000')
-        return [color_style] * len(row)
+    def highlight_speakers(frame):
+        row_styles = frame['Speaker'].astype(object).map(color_map).fillna(DEFAULT_CELL_STYLE).to_numpy()
+        return pd.DataFrame(
+            np.repeat(row_styles[:, None], frame.shape[1], axis=1), index=frame.index, columns=frame.columns
+        )
     
     try:
         # Returns a Styler object for display (Original behavior)
-        return df.style.apply(highlight_speaker, axis=1)
+        return df.style.apply(highlight_speakers, axis=None)
     except Exception:
         # Fallback in case of Styler issues
         return df
 
-# 3. WORD SCRIPT FORMATTER (from word-editor-app-app.py)
+def render_preview(df):
+    """
+    Paginated preview: filters by speaker and time range on the server, then styles and sends only
+    the current page of rows, so the render cost does not grow with the file size.
+    """
+    start_ms, end_ms = (df[column] for column in SRT_MS_COLUMNS)
+    color_map = speaker_color_map(df['Speaker'])
+    filter_col, time_col = st.columns([1, 1])
+
+    with filter_col:
+        selected_speakers = st.multiselect(
+            "Filter by speaker", list(color_map), key="preview_speakers",
+            placeholder="All speakers"
+        )
+    with time_col:
+        max_seconds = max(1, int(end_ms.max() // 1000) + 1)
+        start_seconds, end_seconds = st.slider(
+            "Filter by start time (seconds)", 0, max_seconds, (0, max_seconds), key="preview_time_range"
+        )
+
+    mask = start_ms.between(start_seconds * 1000, end_seconds * 1000).to_numpy()
+    if selected_speakers:
+        mask = mask & df['Speaker'].isin(selected_speakers).to_numpy()
+    filtered = df[mask]
+
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    with size_col:
+        page_size = st.selectbox("Rows per page", PREVIEW_PAGE_SIZES, index=1, key="preview_page_size")
+    page_count = max(1, -(-len(filtered) // page_size))
+    with page_col:
+        # No key: the widget (and page) resets whenever the filtered page count changes
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+    with info_col:
+        st.caption(f"Showing {len(filtered):,} of {len(df):,} rows.")
+
+    page_df = filtered.iloc[(page - 1) * page_size:page * page_size]
+    with profiling.stage('style_preview', rows=len(page_df)):
+        st.dataframe(apply_styles(page_df[SRT_COLUMNS], color_map), use_container_width=True)
 
-def set_all_text_formatting(doc):
-    """Applies Times New Roman 12pt and specific Spacing (Before: 0pt, After: 6pt, Single Line) to all runs/paragraphs."""
-    for paragraph in doc.paragraphs:
-        for run in paragraph.runs:
-            run.font.name = TARGET_FONT
-            run.font.size = TARGET_SIZE_PT
-        
-        paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE
-        paragraph.paragraph_format.space_before = Pt(0)
-        paragraph.paragraph_format.space_after = Pt(6)
+# --------------------------------------------------------------------------------
+# --- SESSION RESULT CACHE ---
+# --------------------------------------------------------------------------------
 
-def process_docx(uploaded_file, file_name_without_ext):
-    """Performs original advanced document modifications and formatting on a DOCX input."""
-    
-    global speaker_color_map
-    global used_colors
-    speaker_color_map = {}
-    used_colors = [] # Reset used colors
-    
-    # Load the DOCX file uploaded by the user
-    original_document = Document(io.BytesIO(uploaded_file.getvalue()))
-    raw_paragraphs = [p for p in original_document.paragraphs if p.text.strip()]
-    
-    document = Document()
-    
-    # --- A. Set Main Title (25pt, 2 blank lines after) ---
-    title_paragraph = document.add_paragraph(file_name_without_ext.upper())
-    title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    title_paragraph.paragraph_format.space_before = Pt(0)
-    title_paragraph.paragraph_format.space_after = Pt(0) 
-    
-    title_run = title_paragraph.runs[0]
-    title_run.font.name = TARGET_FONT
-    title_run.font.size = Pt(25) 
-    title_run.bold = True
-    
-    document.add_paragraph().paragraph_format.space_after = Pt(0)
-    document.add_paragraph().paragraph_format.space_after = Pt(0)
+class ResultCache:
+    """Size-bounded LRU cache of conversion results, keyed by upload content hash and result kind."""
+
+    def __init__(self, max_bytes=SESSION_CACHE_MAX_BYTES, max_entries=SESSION_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Returns the cached value (marking it most recently used) or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        """Stores a value and evicts least recently used entries until the limits are met."""
+        size = result_size(value)
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return value
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+def result_size(value):
+    """Approximate in-memory size of a cached result in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 0
+
+def upload_digest(uploaded_file):
+    """SHA-256 of the uploaded bytes, computed on the upload buffer without copying it."""
+    with uploaded_file.getbuffer() as buffer:
+        return hashlib.sha256(buffer).hexdigest()
+
+def get_session_cache():
+    """Returns this Streamlit session's ResultCache (each session gets its own)."""
+    if 'result_cache' not in st.session_state:
+        st.session_state['result_cache'] = ResultCache()
+    return st.session_state['result_cache']
+
+def cached_result(uploaded_file, kind, compute, *options):
+    """Returns the session-cached result for this upload/kind/options, computing it on a miss."""
+    cache = get_session_cache()
+    key = (upload_digest(uploaded_file), kind) + options
+    result = cache.get(key)
+    if result is None:
+        result = cache.put(key, compute())
+    return result
+
+
+# --- BACKGROUND JOBS (SRT to Word, Word formatter) ---
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide JobQueue shared by all sessions, so jobs outlive reruns."""
+    return jobs.JobQueue()
+
+def get_session_id():
+    """Stable ID of this Streamlit session (job reuse and cancelling stay within one session)."""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+def submit_job(state_key, uploaded_file, kind, **options):
+    """
+    Queues the conversion of this upload in the background and remembers the job ID in the session;
+    with the sidebar's cProfile option on, the job is profiled too.
+    """
+    profile = st.session_state.get("profile_run", False)
+    key = (upload_digest(uploaded_file), kind, uploaded_file.name, get_session_id(), profile) + tuple(sorted(options.items()))
+    job = get_job_queue().submit(
+        kind, uploaded_file.name, uploaded_file.getvalue(), key=key, profile=profile, **options
+    )
+    st.session_state[state_key] = job.id
+    st.session_state[f"{state_key}_celebrate"] = True
+    return job
 
-    # --- B. Process raw paragraphs and add to new document ---
-    
-    for paragraph in raw_paragraphs:
-        text = paragraph.text.strip()
-        
-        # B.1 Remove SRT Line Numbers (from basic converters)
-        if re.fullmatch(r"^\s*\d+\s*$", text):
-            continue 
-            
-        new_paragraph = document.add_paragraph()
-        new_paragraph.style = document.styles['Normal']
-        new_paragraph.paragraph_format.space_before = Pt(0) 
-        new_paragraph.paragraph_format.space_after = Pt(6) 
-        
-        # B.2 Bold Timecode (Override Space After = 0)
-        if TIMECODE_REGEX.match(text):
-            new_paragraph.text = text
-            for run in new_paragraph.runs:
-                run.font.bold = True
-            new_paragraph.paragraph_format.space_after = Pt(0) 
-
-        # B.3 Content (Speaker/Content)
-        else:
-            
-            speaker_match = SPEAKER_REGEX.match(text)
-            
-            if speaker_match:
-                # 1. Set Hanging Indent and Tab Stop
-                new_paragraph.paragraph_format.left_indent = Inches(1.0)
-                new_paragraph.paragraph_format.first_line_indent = Inches(-1.0)
-                new_paragraph.paragraph_format.tab_stops.add_tab_stop(Inches(1.0), WD_TAB_ALIGNMENT.LEFT)
-                
-                speaker_full = speaker_match.group(0) 
-                speaker_name = speaker_match.group(1).strip()
-                
-                # FIX: Call the fixed color function
-                font_color_object = get_speaker_color(speaker_name) 
-                rest_of_text = text[len(speaker_full):]
-                
-                # Run for the speaker name (Bold and Font Color)
-                run_speaker = new_paragraph.add_run(speaker_full)
-                run_speaker.font.bold = True
-                run_speaker.font.color.rgb = font_color_object 
-                
-                # Insert Tab character
-                new_paragraph.add_run('\t') 
-                
-                current_text = rest_of_text
-                
+def job_panel(state_key, uploaded_file, download_label, mime):
+    """
+    Shows the session's job for this upload: live progress with a Cancel button while it runs
+    (a fragment polls it, the rest of the page stays usable), then the download (and the job's
+    diagnostics) or the error.
+    """
+    job_id = st.session_state.get(state_key)
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None or job.key[0] != upload_digest(uploaded_file):
+        return
+
+    if not job.finished:
+        @st.fragment(run_every=JOB_POLL_SECONDS)
+        def job_progress():
+            if job.finished:
+                st.rerun()
+            if job.status == jobs.JOB_QUEUED:
+                text = "Waiting for a free worker..."
+            elif job.progress >= 1.0:
+                text = "Writing the output file..."
+            elif job.cues_done is not None:
+                text = f"Processed {job.cues_done:,} of {job.cues_total:,} cues"
             else:
-                # No speaker -> No indent
-                new_paragraph.paragraph_format.left_indent = None
-                new_paragraph.paragraph_format.first_line_indent = None
-                current_text = text
+                text = f"Processed {job.progress:.0%} of the input"
+            st.progress(job.progress, text=f"Job `{job.id}`: {text}")
+            if st.button("Cancel", key=f"{state_key}_cancel"):
+                job.cancel()
+                st.rerun()
+        job_progress()
+        return
+
+    if job.status == jobs.JOB_DONE:
+        output_name, data = job.result
+        st.success(f"✅ Conversion complete in {job.finished_at - job.submitted_at:.1f}s! You can download the file.")
+        st.download_button(label=download_label, data=data, file_name=output_name, mime=mime)
+        # The job recorded its stages in its own thread, not in this script run
+        diagnostics_expander(job.run, scope=f"background job `{job.id}`", key=f"{state_key}_profile")
+        st.markdown("---")
+        if st.session_state.pop(f"{state_key}_celebrate", False):
+            st.balloons()
+    elif job.status == jobs.JOB_CANCELLED:
+        st.warning("Conversion cancelled.")
+    else:
+        st.error(f"An error occurred during processing: {job.error}")
+        st.warning("Please check the format of the input file.")
 
-            # --- B.4 Process HTML tags within the current_text ---
-            
-            # Using the original (and potentially buggy) regex for fidelity to the original file
-            matches = list(HTML_CONTENT_REGEX.finditer(current_text))
-            last_end = 0
-            
-            if not speaker_match:
-                 new_paragraph.text = "" 
-
-            for match in matches:
-                tag_text = match.group(2) 
-                start, end = match.span()
-
-                # Add text BEFORE the tag (if any)
-                if start > last_end:
-                    new_paragraph.add_run(current_text[last_end:start])
-                
-                # Add the HTML content (Bold and Italic)
-                run_html = new_paragraph.add_run(tag_text)
-                run_html.font.bold = True
-                run_html.font.italic = True
-                
-                last_end = end
-
-            # Add remaining text AFTER the last tag
-            if last_end < len(current_text):
-                new_paragraph.add_run(current_text[last_end:])
-            
-            # Handle case with no tag and no speaker (plain text)
-            elif not speaker_match and not matches:
-                new_paragraph.add_run(current_text)
 
-    # C. Apply General Font/Size and Spacing (Global settings)
-    set_all_text_formatting(document)
-    
-    modified_file = io.BytesIO()
-    document.save(modified_file)
-    modified_file.seek(0)
-    
-    return modified_file
+# --- TIMING EDIT CONTROLS (Timing page, Batch page) ---
+
+def timing_controls(key_prefix):
+    """
+    Widgets for core.apply_timing_edits. Returns its keyword options ({} when nothing is set),
+    or None when an entered resync timecode is invalid (the error is shown in place).
+    """
+    timing = {}
+    col_offset, col_from, col_to = st.columns(3)
+    offset_ms = col_offset.number_input("Shift (ms, negative = earlier)", value=0, step=100, key=f"{key_prefix}_offset")
+    fps_choices = ["(no change)"] + [f"{fps:g}" for fps in COMMON_FRAME_RATES]
+    source_fps = col_from.selectbox("Frame rate: from", fps_choices, key=f"{key_prefix}_fps_from")
+    target_fps = col_to.selectbox("Frame rate: to", fps_choices, key=f"{key_prefix}_fps_to")
+    if offset_ms:
+        timing['offset_ms'] = int(offset_ms)
+    if source_fps != fps_choices[0] and target_fps != fps_choices[0] and source_fps != target_fps:
+        timing['scale'] = fps_scale_factor(float(source_fps), float(target_fps))
+
+    if st.checkbox("Two-point resync (map two subtitle times to where they should be)", key=f"{key_prefix}_resync"):
+        col_src1, col_dst1, col_src2, col_dst2 = st.columns(4)
+        points = (
+            col_src1.text_input("Point 1: subtitle time", "00:00:00,000", key=f"{key_prefix}_src1"),
+            col_dst1.text_input("Point 1: correct time", "00:00:00,000", key=f"{key_prefix}_dst1"),
+            col_src2.text_input("Point 2: subtitle time", "01:00:00,000", key=f"{key_prefix}_src2"),
+            col_dst2.text_input("Point 2: correct time", "01:00:00,000", key=f"{key_prefix}_dst2"),
+        )
+        try:
+            src1, dst1, src2, dst2 = (parse_timecode(point) for point in points)
+        except ValueError as e:
+            st.error(str(e))
+            return None
+        if (src1, src2) != (dst1, dst2):
+            timing['resync'] = ((src1, dst1), (src2, dst2))
+
+    if st.checkbox("Fix overlapping cues", key=f"{key_prefix}_fix_overlaps"):
+        timing['min_gap_ms'] = int(st.number_input(
+            "Minimum gap between cues (ms)", min_value=0, value=0, step=10, key=f"{key_prefix}_min_gap"
+        ))
+    return timing
 
 
 # --------------------------------------------------------------------------------
@@ -430,61 +312,103 @@ def srt_to_docx_page():
 
     if uploaded_file is not None:
         original_filename = uploaded_file.name
-        file_name_without_ext = os.path.splitext(original_filename)[0]
         
         st.info(f"File received: **{original_filename}**.")
+
+        engine_label = st.radio(
+            "Conversion engine",
+            ("Standard (python-docx)", "Fast (direct OOXML, recommended for long files)"),
+            key="srt_docx_engine",
+            horizontal=True
+        )
+        engine = DOCX_ENGINE_OOXML if engine_label.startswith("Fast") else DOCX_ENGINE_PYTHON_DOCX
         
+        # Runs as a background job: progress and result survive reruns of this page
         if st.button("2. RUN WORD CONVERSION", key="run_srt_docx"):
-            with st.spinner('Processing and creating Word file...'):
-                try:
-                    modified_file_io = process_srt_to_docx(uploaded_file, file_name_without_ext)
-                    
-                    new_filename = f"CONVERTED_{file_name_without_ext}.docx"
-
-                    st.success("✅ Conversion complete! You can download the file.")
-                    
-                    st.download_button(
-                        label="3. Download Converted Word File",
-                        data=modified_file_io,
-                        file_name=new_filename,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-                    
-                    st.markdown("---")
-                    st.balloons()
+            submit_job("srt_docx_job", uploaded_file, 'srt_docx', engine=engine)
 
-                except Exception as e:
-                    st.error(f"An error occurred during processing: {e}")
-                    st.warning("Please check the format of the input SRT file.")
+        job_panel(
+            "srt_docx_job", uploaded_file,
+            "3. Download Converted Word File",
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
 
 
 def srt_to_excel_page():
     # UI text from original srt-excel-converter-app.py (translated to English)
     st.markdown("## 📊 Analyze & Convert SRT to Excel (.xlsx)")
-    st.markdown("This function analyzes the SRT file to extract detailed dialogue and corresponding speaker, then exports to an Excel file.")
+    st.markdown("This function analyzes the SRT file to extract detailed dialogue and corresponding speaker, then exports to an Excel file (or Parquet / CSV / JSON Lines for analytics pipelines).")
     st.markdown("---")
     
     # NOTE: This warning is necessary due to format limitations (as explained previously)
     st.warning("⚠️ **NOTE ON EXCEL FORMATTING:** The colorful highlighting is for the web preview only and CANNOT be included in the downloaded Excel (.xlsx) file due to format limitations. The downloaded file will contain clean, organized data.")
     st.markdown("---")
 
-    uploaded_file = st.file_uploader("1. Upload your SRT file (.srt)", type="srt", key="srt_excel_uploader")
+    show_preview = st.checkbox(
+        "Show speaker statistics and data preview",
+        value=True,
+        key="srt_excel_show_preview",
+        help="Untick for very large files: the Excel file is then streamed straight from the SRT without building the preview table."
+    )
 
-    if uploaded_file is not None:
-        try:
-            srt_content = uploaded_file.read().decode("utf-8")
-        except Exception:
-            st.error("File encoding error. Please ensure your SRT file is correctly encoded (UTF-8 recommended).")
-            return
+    with st.expander("Advanced: extra non-speaker phrases"):
+        phrases_file = st.file_uploader(
+            "Optional .txt file, one phrase per line (e.g. 'fun fact'), that should never be treated as a speaker name",
+            type="txt",
+            key="srt_excel_phrases_uploader"
+        )
+
+    export_labels = {f"{label} ({extension})": export_format for export_format, (extension, _, label) in EXPORT_FORMATS.items()}
+    export_label = st.radio(
+        "Download format",
+        list(export_labels),
+        key="srt_excel_export_format",
+        horizontal=True,
+        help="Parquet, CSV and JSON Lines contain the same rows with integer millisecond timecodes, for analytics tools; Parquet is the most compact."
+    )
+    export_format = export_labels[export_label]
 
+    speaker_classifier = None
+    phrases_digest = None
+    if phrases_file is not None:
+        phrases_text = decode_text(phrases_file.getvalue())
+        speaker_classifier = SpeakerClassifier(parse_non_speaker_phrases(phrases_text))
+        phrases_digest = upload_digest(phrases_file)
+
+    uploaded_file = st.file_uploader("1. Upload your SRT file (.srt)", type="srt", key="srt_excel_uploader")
+
+    if uploaded_file is not None and not show_preview:
+        with st.spinner('Exporting SRT data...'):
+            try:
+                export_bytes = cached_result(
+                    uploaded_file, f'srt_{export_format}',
+                    lambda: artifacts.cached_convert(
+                        f'srt_{export_format}', uploaded_file, uploaded_file.name,
+                        digest=upload_digest(uploaded_file), speaker_classifier=speaker_classifier
+                    )[1],
+                    phrases_digest
+                )
+            except UnicodeDecodeError:
+                st.error("File encoding error: the SRT file could not be decoded (UTF-8, UTF-16, Windows-1252 and Latin-1 are supported).")
+                return
+        export_download_section(uploaded_file, export_format, export_bytes)
+
+    elif uploaded_file is not None:
         with st.spinner('Analyzing SRT data...'):
-            # Use the original parser (which returns clean text for Excel)
-            df_converted = parse_srt(srt_content)
+            try:
+                # Same rows as the original parser, redoing only the cues changed since the last upload
+                revision = srt_revision(uploaded_file, speaker_classifier, phrases_digest)
+            except UnicodeDecodeError:
+                st.error("File encoding error: the SRT file could not be decoded (UTF-8, UTF-16, Windows-1252 and Latin-1 are supported).")
+                return
+        df_converted = revision['df']
         
         if df_converted.empty:
             st.error("Could not parse any subtitles.")
             return
 
+        revision_report_section(revision['report'])
+
         st.subheader("📊 Speaker Statistics")
         
         unique_speakers = df_converted['Speaker'].unique()
@@ -498,31 +422,91 @@ def srt_to_excel_page():
             st.markdown(f"**List of Speakers:** {speaker_list_str}")
         else:
             st.info("No clear speakers found.")
+
+        stats = timing_stats(*(df_converted[column].to_numpy() for column in SRT_MS_COLUMNS))
+        st.caption(
+            f"Timing: {stats['cues']:,} cues, {stats['total_duration_ms'] / 60000:.1f} min on screen, "
+            f"mean {stats['mean_duration_ms'] / 1000:.2f}s per cue, "
+            f"{stats['overlap_count']:,} overlapping cue(s) (max {stats['max_overlap_ms']} ms)."
+        )
             
         st.subheader("Converted Data Preview (Web Styling Only)")
         
-        # Apply styling ONLY for the web preview
-        styled_df_display = apply_styles(df_converted)
-        st.dataframe(styled_df_display, use_container_width=True)
+        # Apply styling ONLY for the web preview, one page at a time
+        render_preview(df_converted)
 
         st.markdown("---")
         
-        output = io.BytesIO()
-        
-        # FIX FOR CRASH: Save the original DataFrame (df_converted) instead of the Styler object
-        df_converted.to_excel(output, index=False, engine='openpyxl') 
-        output.seek(0)
+        if export_format == 'xlsx':
+            export_bytes = revision_xlsx_bytes(revision)
+        else:
+            export_bytes = cached_result(
+                uploaded_file, f'srt_{export_format}',
+                lambda: dataframe_to_export_bytes(df_converted, export_format),
+                phrases_digest
+            )
+        export_download_section(uploaded_file, export_format, export_bytes)
 
-        original_name_base = uploaded_file.name.rsplit('.', 1)[0]
-        file_name = f"{original_name_base}_DATA.xlsx"
-        
-        st.download_button(
-            label="💾 Download Analyzed Excel File (.xlsx)",
-            data=output.read(), 
-            file_name=file_name,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        st.success(f"File ready for download as **{file_name}**!")
+
+def srt_revision(uploaded_file, speaker_classifier, phrases_digest):
+    """
+    Parses the upload with the session's SrtRevisionTracker, so a revised version of the previously
+    analyzed file (same file name) only re-parses and re-renders the cues that changed. Returns the
+    session's current revision: {'key', 'df', 'report', 'tracker', 'xlsx'} (recomputed only when the
+    upload changes; 'xlsx' is built on demand by revision_xlsx_bytes).
+    """
+    key = (upload_digest(uploaded_file), uploaded_file.name, phrases_digest)
+    revision = st.session_state.get('srt_revision')
+    if revision is not None and revision['key'] == key:
+        return revision
+
+    history = (uploaded_file.name, phrases_digest)
+    tracker = st.session_state.get('srt_revision_tracker')
+    if tracker is None or st.session_state.get('srt_revision_history') != history:
+        # Another file, or different speaker rules (different rows): start a new revision history
+        tracker = SrtRevisionTracker(speaker_classifier)
+        st.session_state['srt_revision_tracker'] = tracker
+        st.session_state['srt_revision_history'] = history
+
+    table, report = tracker.update(uploaded_file)
+    revision = {'key': key, 'df': table.to_dataframe(), 'report': report, 'tracker': tracker, 'xlsx': None}
+    st.session_state['srt_revision'] = revision
+    return revision
+
+def revision_xlsx_bytes(revision):
+    """The revision's .xlsx from the tracker's per-cue row XML, assembled the first time it is requested."""
+    if revision['xlsx'] is None:
+        revision['xlsx'] = revision['tracker'].xlsx_bytes()
+    return revision['xlsx']
+
+def revision_report_section(report):
+    """Change report against the previously analyzed upload (nothing for the first one)."""
+    if not report['previous']:
+        return
+    if not report['changes']:
+        st.info(f"No cue changes since the previously analyzed file ({report['cues']:,} cues).")
+        return
+    st.info(
+        f"Compared with the previously analyzed file: **{report['changed']:,}** changed, "
+        f"**{report['added']:,}** added, **{report['removed']:,}** removed, "
+        f"{report['unchanged']:,} unchanged cue(s); {report['reparsed']:,} re-parsed."
+    )
+    with st.expander("📝 Change report"):
+        st.dataframe(pd.DataFrame(report['changes']), use_container_width=True, hide_index=True)
+
+def export_download_section(uploaded_file, export_format, export_bytes):
+    """Download button for the analyzed data in the chosen format (shared by the preview and streaming modes)."""
+    extension, mime, label = EXPORT_FORMATS[export_format]
+    original_name_base = uploaded_file.name.rsplit('.', 1)[0]
+    file_name = f"{original_name_base}_DATA{extension}"
+    
+    st.download_button(
+        label=f"💾 Download Analyzed {label} File ({extension})",
+        data=export_bytes, 
+        file_name=file_name,
+        mime=mime
+    )
+    st.success(f"File ready for download as **{file_name}**!")
 
 
 def word_formatter_page():
@@ -543,33 +527,147 @@ def word_formatter_page():
 
     if uploaded_file is not None:
         original_filename = uploaded_file.name
-        file_name_without_ext = os.path.splitext(original_filename)[0]
         
         st.info(f"File received: **{original_filename}**.")
         
+        # Runs as a background job (original DOCX processing function): survives reruns of this page
         if st.button("2. RUN AUTOMATIC FORMATTING", key="run_word_formatter"):
-            with st.spinner('Processing and formatting file...'):
+            submit_job("word_formatter_job", uploaded_file, 'docx_format')
+
+        job_panel(
+            "word_formatter_job", uploaded_file,
+            "3. Download Formatted Word File",
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+
+
+def srt_timing_page():
+    st.markdown("## ⏱️ SRT Timing Fix (Shift / Scale / Resync)")
+    st.markdown("This function shifts all subtitles, converts them between frame rates (e.g. 23.976 → 25 fps), re-syncs them from two reference points and repairs overlapping cues, then exports the result as SRT, Word or Excel.")
+    st.markdown("---")
+
+    uploaded_file = st.file_uploader("1. Upload your SRT file (.srt)", type="srt", key="srt_timing_uploader")
+
+    if uploaded_file is not None:
+        timing = timing_controls("srt_timing")
+        output_labels = {"SRT (.srt)": 'srt_retime', "Word (.docx)": 'srt_docx', "Excel (.xlsx)": 'srt_xlsx'}
+        output_label = st.radio("Output format", list(output_labels), key="srt_timing_output", horizontal=True)
+        kind = output_labels[output_label]
+
+        if timing is not None and st.button("2. APPLY TIMING CHANGES", key="run_srt_timing"):
+            options = {'engine': DOCX_ENGINE_OOXML} if kind == 'srt_docx' else {}
+            with st.spinner('Retiming subtitles...'):
                 try:
-                    # Use the original DOCX processing function
-                    modified_file_io = process_docx(uploaded_file, file_name_without_ext)
-                    
-                    new_filename = f"FORMATTED_{original_filename}"
-
-                    st.success("✅ Formatting complete! You can download the file.")
-                    
-                    st.download_button(
-                        label="3. Download Formatted Word File",
-                        data=modified_file_io,
-                        file_name=new_filename,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                    output_bytes = cached_result(
+                        uploaded_file, f"timing_{kind}",
+                        lambda: artifacts.cached_convert(
+                            kind, uploaded_file, uploaded_file.name, digest=upload_digest(uploaded_file),
+                            timing=timing, **options
+                        )[1],
+                        tuple(sorted(timing.items())),
+                        # Word output embeds the file name as its title
+                        artifacts.output_name_key(kind, uploaded_file.name)
                     )
-                    
-                    st.markdown("---")
-                    st.balloons()
-
-                except Exception as e:
+                except (UnicodeDecodeError, ValueError) as e:
                     st.error(f"An error occurred during processing: {e}")
-                    st.warning("Please check the format of the input file.")
+                    return
+
+            st.success("✅ Timing changes applied! You can download the file.")
+            st.download_button(
+                label="3. Download Retimed File",
+                data=output_bytes,
+                file_name=conversion_output_name(kind, uploaded_file.name),
+                key="download_srt_timing"
+            )
+
+
+def batch_page():
+    st.markdown("## 🗂️ Batch Conversion (Multiple Files / ZIP)")
+    st.markdown("This function runs one of the conversions above over many files at once, in parallel on all CPU cores, and returns a single **.zip** with every result.")
+    st.markdown("---")
+
+    labels = {label: kind for kind, (_, label) in CONVERSIONS.items()}
+    conversion_label = st.selectbox("Conversion", list(labels), key="batch_conversion")
+    kind = labels[conversion_label]
+    extension = CONVERSIONS[kind][0]
+
+    options = {}
+    if kind == 'srt_docx':
+        engine_label = st.radio(
+            "Conversion engine",
+            ("Fast (direct OOXML, recommended for long files)", "Standard (python-docx)"),
+            key="batch_srt_docx_engine",
+            horizontal=True
+        )
+        options['engine'] = DOCX_ENGINE_OOXML if engine_label.startswith("Fast") else DOCX_ENGINE_PYTHON_DOCX
+    if extension == '.srt':
+        with st.expander("Timing changes (shift / frame rate / resync / overlaps)", expanded=kind == 'srt_retime'):
+            timing = timing_controls("batch_timing")
+        if timing is None:
+            return
+        options['timing'] = timing
+
+    uploaded_files = st.file_uploader(
+        f"1. Upload your {extension} files or .zip archives",
+        type=[extension.lstrip('.'), 'zip'],
+        accept_multiple_files=True,
+        key=f"batch_uploader_{kind}"
+    )
+
+    if uploaded_files:
+        inputs = list(batch.iter_batch_inputs(uploaded_files, extension))
+        st.info(f"Files received: **{len(inputs)}** {extension} file(s).")
+
+        if inputs and st.button("2. RUN BATCH CONVERSION", key="run_batch"):
+            progress_bar = st.progress(0.0, text="Starting workers...")
+            file_log = st.container()
+
+            def on_progress(done, total, file_name, error):
+                progress_bar.progress(done / total, text=f"Processed {done}/{total}: {file_name}")
+                if error:
+                    file_log.markdown(f"❌ **{file_name}**: {error}")
+                else:
+                    file_log.markdown(f"✅ {file_name}")
+
+            result_zip, errors = batch.run_batch(kind, inputs, options, on_progress=on_progress)
+
+            if errors:
+                st.warning(f"{len(errors)} file(s) failed; see ERRORS.txt inside the zip.")
+            st.success(f"✅ Batch complete: {len(inputs) - len(errors)}/{len(inputs)} file(s) converted.")
+
+            st.download_button(
+                label="3. Download All Results (.zip)",
+                data=result_zip,
+                file_name=f"BATCH_{kind.upper()}_{datetime.now():%Y%m%d_%H%M%S}.zip",
+                mime="application/zip"
+            )
+
+
+# --- DIAGNOSTICS (per-run stage timings, see profiling.py) ---
+
+def diagnostics_expander(run, scope="script run", key="download_profile"):
+    """
+    Stage table (and cProfile summary/dump when enabled) for the conversions of a recorded run:
+    this script run, or a background job's own run (scope names it, key keeps its widgets apart).
+    """
+    if run is None or (not run.stages and run.profile_bytes is None):
+        return
+    title = "🩺 Diagnostics" if scope == "script run" else f"🩺 Diagnostics ({scope})"
+    with st.expander(title):
+        if run.stages:
+            st.dataframe(pd.DataFrame(run.stages), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No conversion stages ran (results came from the session cache).")
+        st.caption(f"Whole {scope}: {run.seconds:.3f}s.")
+        if run.profile_bytes is not None:
+            st.code(run.profile_summary, language=None)
+            st.download_button(
+                label="Download cProfile dump (.prof)",
+                data=run.profile_bytes,
+                file_name=f"{run.pipeline}-{datetime.now():%Y%m%d_%H%M%S}.prof",
+                mime="application/octet-stream",
+                key=key
+            )
 
 
 # --------------------------------------------------------------------------------
@@ -594,7 +692,9 @@ def main():
         (
             "1. SRT to Word (Basic)",
             "2. SRT to Excel (Analysis)",
-            "3. Word Script Formatting"
+            "3. Word Script Formatting",
+            "4. Batch Conversion",
+            "5. SRT Timing Fix"
         )
     )
 
@@ -604,19 +704,28 @@ def main():
         **Usage:**
         - Each function operates independently.
         - Upload the file, run the process, and download the result.
+        - Use Batch Conversion for many files (or a .zip) at once.
+        - Use SRT Timing Fix to shift, rescale or re-sync subtitles.
         """
     )
+    profile_run = st.sidebar.checkbox(
+        "Diagnostics: profile with cProfile",
+        key="profile_run",
+        help="Runs the page under cProfile and offers the .prof dump in the Diagnostics panel (slower)."
+    )
+    profiling.configure_logging()
     
-    # Route to the selected page function
-    if app_mode == "1. SRT to Word (Basic)":
-        srt_to_docx_page()
-    elif app_mode == "2. SRT to Excel (Analysis)":
-        srt_to_excel_page()
-    elif app_mode == "3. Word Script Formatting":
-        word_formatter_page()
+    # Route to the selected page function; stages timed by the core are collected per script run
+    page = {
+        "1. SRT to Word (Basic)": srt_to_docx_page,
+        "2. SRT to Excel (Analysis)": srt_to_excel_page,
+        "3. Word Script Formatting": word_formatter_page,
+        "4. Batch Conversion": batch_page,
+        "5. SRT Timing Fix": srt_timing_page,
+    }[app_mode]
+    with profiling.record(page.__name__, profile=profile_run) as run:
+        page()
+    diagnostics_expander(run)
 
 if __name__ == "__main__":
-    if not FONT_COLORS_RGB_150:
-         FONT_COLORS_RGB_150 = generate_vibrant_rgb_colors(150)
-         
     main()
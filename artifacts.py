@@ -0,0 +1,222 @@
+"""
+Persistent artifact cache: conversion outputs stored on disk under a content address (input bytes,
+conversion kind and options, and the version of the conversion code), shared by every process
+that points at the same directory - server restarts, Streamlit sessions, batch and CLI workers.
+
+Writes go to a temporary file that is renamed into place, so readers never see a partial entry.
+Each read refreshes the entry's modification time, and the least recently used entries are
+removed once the directory grows past its size cap.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+from functools import lru_cache
+
+import profiling
+import core
+from core import DEFAULT_SPEAKER_CLASSIFIER, SpeakerClassifier, conversion_output_name, convert
+
+# Environment variables: cache directory (no cache when unset) and its size cap in MiB
+ARTIFACT_CACHE_DIR_ENV = 'TOOLKIT_CACHE_DIR'
+ARTIFACT_CACHE_MAX_MB_ENV = 'TOOLKIT_CACHE_MAX_MB'
+DEFAULT_ARTIFACT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Bump when the key or file layout changes
+ARTIFACT_CACHE_LAYOUT = 1
+# Temporary files older than this are left over from a crashed writer and get removed
+STALE_TEMP_SECONDS = 3600
+DIGEST_CHUNK_BYTES = 1024 * 1024
+
+# Conversions whose output embeds the input file name (the document title)
+NAME_DEPENDENT_CONVERSIONS = ('srt_docx', 'docx_format')
+# Options that change how a conversion runs but never its output
+OUTPUT_NEUTRAL_OPTIONS = ('workers',)
+
+@lru_cache(maxsize=None)
+def pipeline_version():
+    """Digest of the conversion code (core.py), so outputs of another version are never reused."""
+    with open(core.__file__, 'rb') as source:
+        return hashlib.sha256(source.read()).hexdigest()[:16]
+
+def stream_digest(stream):
+    """SHA-256 of a seekable binary stream's content (the stream is rewound)."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(DIGEST_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def _option_value(value):
+    if isinstance(value, SpeakerClassifier):
+        return {'non_speaker_phrases': sorted(value.non_speaker_phrases)}
+    # Unknown objects: repr() is specific to the instance, so they simply never hit
+    return repr(value)
+
+def output_name_key(kind, file_name):
+    """The part of the input file name the output embeds (the document title), or None if it embeds none."""
+    if kind in NAME_DEPENDENT_CONVERSIONS:
+        return os.path.splitext(os.path.basename(file_name))[0]
+    return None
+
+def _key_options(options):
+    """
+    The options that can change the output, in one canonical form: run-only options, None and empty
+    values (e.g. timing={}) and a classifier with just the built-in phrases are all the defaults, so
+    the CLI, batch workers and pages passing them differently still share entries.
+    """
+    key_options = {}
+    for name, value in options.items():
+        if name in OUTPUT_NEUTRAL_OPTIONS or value is None:
+            continue
+        if isinstance(value, (dict, list, tuple, set, frozenset, str)) and not value:
+            continue
+        if isinstance(value, SpeakerClassifier) and value.non_speaker_phrases == DEFAULT_SPEAKER_CLASSIFIER.non_speaker_phrases:
+            continue
+        key_options[name] = value
+    return key_options
+
+def artifact_key(kind, input_digest, file_name, options):
+    """Cache key of one conversion: input content, kind, output-relevant options and code version."""
+    key_parts = {
+        'layout': ARTIFACT_CACHE_LAYOUT,
+        'pipeline': pipeline_version(),
+        'kind': kind,
+        'input': input_digest,
+        'options': _key_options(options),
+    }
+    name = output_name_key(kind, file_name)
+    if name is not None:
+        key_parts['name'] = name
+    encoded = json.dumps(key_parts, sort_keys=True, default=_option_value)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+class ArtifactCache:
+    """Size-capped LRU store of conversion outputs in a directory (one file per entry)."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_ARTIFACT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Returns the cached bytes (marking them most recently used) or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as entry:
+                data = entry.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another process meanwhile
+        return data
+
+    def put(self, key, data):
+        """Stores bytes atomically and evicts least recently used entries past the size cap."""
+        if len(data) > self.max_bytes:
+            return data
+        shard = os.path.dirname(self._path(key))
+        os.makedirs(shard, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=shard, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as entry:
+                entry.write(data)
+                entry.flush()
+                os.fsync(entry.fileno())
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+        return data
+
+    def evict(self):
+        """Removes least recently used entries (oldest mtime first) until the cap is met."""
+        entries = []
+        total_bytes = 0
+        now = time.time()
+        with os.scandir(self.directory) as shards:
+            shard_paths = [shard.path for shard in shards if shard.is_dir()]
+        for shard_path in shard_paths:
+            with os.scandir(shard_path) as shard:
+                for entry in shard:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    if entry.name.startswith('.'):
+                        # A write in progress, or abandoned by a crashed writer
+                        if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                            _remove(entry.path)
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            _remove(path)
+            total_bytes -= size
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+_default_caches = {}
+
+def configured_max_bytes():
+    """Size cap from $TOOLKIT_CACHE_MAX_MB, or the default."""
+    max_mb = os.environ.get(ARTIFACT_CACHE_MAX_MB_ENV)
+    return int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_ARTIFACT_CACHE_MAX_BYTES
+
+def default_cache():
+    """The cache configured through $TOOLKIT_CACHE_DIR / $TOOLKIT_CACHE_MAX_MB, or None if unset."""
+    directory = os.environ.get(ARTIFACT_CACHE_DIR_ENV)
+    if not directory:
+        return None
+    max_bytes = configured_max_bytes()
+    cache = _default_caches.get((directory, max_bytes))
+    if cache is None:
+        cache = _default_caches[(directory, max_bytes)] = ArtifactCache(directory, max_bytes)
+    return cache
+
+def cached_convert(kind, source, file_name, cache=None, digest=None, **options):
+    """
+    convert() through the artifact cache: returns (output_name, output_bytes), converting only on a
+    miss. cache: an ArtifactCache (default: default_cache(); without one this is plain convert());
+    digest: SHA-256 hex of the input if already known, else it is computed from the stream.
+    """
+    cache = cache if cache is not None else default_cache()
+    if cache is None:
+        return convert(kind, source, file_name, **options)
+
+    with profiling.stage('artifact_cache_lookup') as info:
+        key = artifact_key(kind, digest or stream_digest(source), file_name, options)
+        data = cache.get(key)
+        info['hit'] = data is not None
+    if data is not None:
+        return conversion_output_name(kind, file_name), data
+
+    output_name, data = convert(kind, source, file_name, **options)
+    with profiling.stage('artifact_cache_store', bytes=len(data)):
+        try:
+            cache.put(key, data)
+        except OSError as e:
+            # The cache is best effort: a full or read-only disk must not fail the conversion
+            profiling.logger.warning(json.dumps({'artifact_cache': 'store failed', 'error': str(e)}))
+    return output_name, data
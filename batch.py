@@ -0,0 +1,73 @@
+"""
+Batch conversion: runs one of the toolkit conversions over many files (or the contents of
+.zip uploads) in a process pool and packs every result into a single .zip.
+"""
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from artifacts import cached_convert
+from core import mp_context, unique_output_name
+
+def convert_batch_file(kind, file_name, data, options=None):
+    """
+    Worker entry point (runs in a pool process): converts one input and returns (output_name, bytes),
+    reusing the artifact cache when one is configured. Only the headless core is imported in workers,
+    never Streamlit.
+    """
+    return cached_convert(kind, io.BytesIO(data), file_name, **(options or {}))
+
+def iter_batch_inputs(uploaded_files, extension):
+    """
+    Yields (file_name, bytes) for every upload with the given extension, expanding .zip uploads
+    into their matching members (folders and macOS metadata entries are skipped).
+    """
+    for uploaded_file in uploaded_files:
+        name = os.path.basename(uploaded_file.name)
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(uploaded_file.getvalue())) as archive:
+                for member in archive.infolist():
+                    member_name = os.path.basename(member.filename)
+                    if member.is_dir() or member.filename.startswith('__MACOSX/') or member_name.startswith('._'):
+                        continue
+                    if member_name.lower().endswith(extension):
+                        yield member_name, archive.read(member)
+        elif name.lower().endswith(extension):
+            yield name, uploaded_file.getvalue()
+
+def run_batch(kind, inputs, options=None, max_workers=None, on_progress=None):
+    """
+    Converts every (file_name, bytes) input in a process pool and returns (zip_bytes, errors).
+    on_progress(done, total, file_name, error) is called in the calling thread as each file finishes;
+    failed files are listed in `errors` (and in ERRORS.txt inside the zip) instead of aborting the batch.
+    """
+    inputs = list(inputs)
+    total = len(inputs)
+    errors = []
+    used_names = set()
+    output = io.BytesIO()
+
+    max_workers = max_workers or min(total, os.cpu_count() or 1) or 1
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as result_zip, \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context()) as pool:
+        futures = {
+            pool.submit(convert_batch_file, kind, file_name, data, options): file_name
+            for file_name, data in inputs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            file_name = futures[future]
+            error = None
+            try:
+                output_name, result = future.result()
+                result_zip.writestr(unique_output_name(output_name, used_names), result)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                errors.append((file_name, error))
+            if on_progress:
+                on_progress(done, total, file_name, error)
+
+        if errors:
+            result_zip.writestr('ERRORS.txt', "\n".join(f"{name}: {error}" for name, error in errors))
+
+    return output.getvalue(), errors
@@ -0,0 +1,43 @@
+"""
+Benchmark: SRT to Word engines (python-docx object model vs direct OOXML writer).
+
+Usage: python benchmarks/bench_srt_docx.py [--cues 5000] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import process_srt_to_docx, DOCX_ENGINE_PYTHON_DOCX, DOCX_ENGINE_OOXML
+from corpus import make_srt
+
+
+def run(engine, srt_bytes, repeat):
+    """Returns (best seconds, output size in bytes) over `repeat` runs."""
+    best, size = None, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = process_srt_to_docx(io.BytesIO(srt_bytes), "benchmark", engine)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        size = len(output.getvalue())
+    return best, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cues', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    srt_bytes = make_srt(cues=args.cues)
+    print(f"{args.cues} cues, best of {args.repeat}")
+    for engine in (DOCX_ENGINE_PYTHON_DOCX, DOCX_ENGINE_OOXML):
+        seconds, size = run(engine, srt_bytes, args.repeat)
+        print(f"{engine:>12}: {seconds:8.3f}s  {args.cues / seconds:10.0f} cues/s  {size / 1024:8.1f} KiB")
+
+if __name__ == '__main__':
+    main()
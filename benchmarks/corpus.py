@@ -0,0 +1,92 @@
+"""
+Seeded synthetic subtitle corpus for the benchmarks.
+
+make_srt() builds SRT bytes with a configurable number of cues, speakers per cue, formatting
+tag density and share of multi-speaker lines; make_docx() turns the same corpus into the
+'SRT to Word (Basic)' layout that the Word formatter expects as input.
+"""
+import io
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SPEAKERS = [
+    "JOHN", "MARY", "Narrator", "Tom & Jerry", "Dr Smith", "Host", "Contestant 1",
+    "Anna", "Mike and Sue", "Producer", "Judge", "Coach",
+]
+NON_SPEAKER_TAGS = ["Note", "the only problem", "Round 2", "here we go", "Update"]
+WORDS = (
+    "the a we just said this is going to be really good okay so now then right here what "
+    "look wait never mind come on let's go back there you know I think maybe tomorrow"
+).split()
+TAGS = ("i", "b", "u", "font color=\"#ffff00\"")
+
+def format_timecode(ms):
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+def make_sentence(rng, tag_density):
+    """A short sentence; each word is wrapped in a formatting tag with probability tag_density."""
+    words = []
+    for _ in range(rng.randint(3, 10)):
+        word = rng.choice(WORDS)
+        if rng.random() < tag_density:
+            tag = rng.choice(TAGS)
+            word = f"<{tag}>{word}</{tag.split()[0]}>"
+        words.append(word)
+    return " ".join(words)
+
+def make_srt(cues=2000, speakers_per_cue=1, tag_density=0.1, multi_speaker_ratio=0.2, seed=0):
+    """
+    Builds a synthetic SRT file (bytes).
+    speakers_per_cue: speaker-labelled lines per cue; multi_speaker_ratio: share of lines that carry
+    a second 'NAME: ' segment inline (plus the occasional non-speaker 'Note: ' style tag).
+    """
+    rng = random.Random(seed)
+    blocks = []
+    start = 0
+    for index in range(1, cues + 1):
+        start += rng.randint(200, 1500)
+        end = start + rng.randint(800, 4000)
+        lines = []
+        for _ in range(max(1, speakers_per_cue)):
+            line = f"{rng.choice(SPEAKERS)}: {make_sentence(rng, tag_density)}"
+            if rng.random() < multi_speaker_ratio:
+                inline = rng.choice(SPEAKERS + NON_SPEAKER_TAGS)
+                line += f" {inline}: {make_sentence(rng, tag_density)}"
+            lines.append(line)
+        if rng.random() < 0.3:
+            lines.append(f"- {make_sentence(rng, tag_density)}")
+        blocks.append(f"{index}\n{format_timecode(start)} --> {format_timecode(end)}\n" + "\n".join(lines))
+        start = end
+    return ("\n\n".join(blocks) + "\n").encode('utf-8')
+
+def make_docx(cues=2000, seed=0, **srt_options):
+    """Builds a DOCX (bytes) in the 'SRT to Word (Basic)' layout from a synthetic SRT."""
+    from core import process_srt_to_docx, DOCX_ENGINE_OOXML
+
+    srt_bytes = make_srt(cues=cues, seed=seed, **srt_options)
+    return process_srt_to_docx(io.BytesIO(srt_bytes), "benchmark", DOCX_ENGINE_OOXML).getvalue()
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic SRT or DOCX input file.")
+    parser.add_argument('output', help="Output path (.srt or .docx).")
+    parser.add_argument('--cues', type=int, default=2000)
+    parser.add_argument('--speakers-per-cue', type=int, default=1)
+    parser.add_argument('--tag-density', type=float, default=0.1)
+    parser.add_argument('--multi-speaker-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    options = dict(speakers_per_cue=args.speakers_per_cue, tag_density=args.tag_density,
+                   multi_speaker_ratio=args.multi_speaker_ratio)
+    if args.output.lower().endswith('.docx'):
+        data = make_docx(cues=args.cues, seed=args.seed, **options)
+    else:
+        data = make_srt(cues=args.cues, seed=args.seed, **options)
+    with open(args.output, 'wb') as output:
+        output.write(data)
+    print(f"{args.output}: {len(data) / 1024:.1f} KiB")
@@ -0,0 +1,178 @@
+"""
+Benchmark harness for the conversion pipelines.
+
+Runs each stage on a seeded synthetic corpus (see corpus.py) and reports wall time (best of
+--repeat), throughput in cues/s and peak traced memory, then compares against the stored
+baseline (benchmarks/baseline.json).
+
+Usage:
+    python benchmarks/run.py                       # run and compare with the baseline
+    python benchmarks/run.py --save-baseline       # run and store the results as the new baseline
+    python benchmarks/run.py --stages parse_srt,clean_dialogue_text --cues 10000 --tag-density 0.5
+    python benchmarks/run.py --max-regression 20   # exit 1 if any stage is >20% slower than baseline
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_srt, make_docx
+import core
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def dialogue_lines(srt_bytes):
+    """Raw (still tagged) dialogue lines of an SRT, as fed to clean_dialogue_text."""
+    return [line for line in srt_bytes.decode('utf-8').split('\n')
+            if line and not line.isdigit() and ' --> ' not in line]
+
+def revised_srt(srt_bytes):
+    """The corpus SRT with the text of its middle cue edited (a typical small revision)."""
+    blocks = srt_bytes.split(b'\n\n')
+    blocks[len(blocks) // 2] += b' (revised)'
+    return b'\n\n'.join(blocks)
+
+def incremental_xlsx_stage(srt_bytes):
+    """Re-export of alternating one-cue revisions through a primed SrtRevisionTracker."""
+    revisions = [srt_bytes, revised_srt(srt_bytes)]
+    tracker = core.SrtRevisionTracker()
+    tracker.update(io.BytesIO(srt_bytes))
+
+    def stage():
+        revisions.reverse()
+        tracker.update(io.BytesIO(revisions[0]))
+        return tracker.xlsx_bytes()
+    return stage
+
+# Worker processes for the parallel parse stage (fixed, so results compare across machines)
+PARALLEL_PARSE_WORKERS = 4
+
+def build_stages(corpus):
+    """stage name -> zero-argument callable running that stage once on the corpus."""
+    srt_bytes, docx_bytes, lines = corpus['srt'], corpus['docx'], corpus['lines']
+    return {
+        'parse_srt': lambda: core.parse_srt(io.BytesIO(srt_bytes)),
+        'parse_srt_parallel': lambda: core.parse_srt_table_parallel(
+            io.BytesIO(srt_bytes), workers=PARALLEL_PARSE_WORKERS,
+            min_chunk_bytes=len(srt_bytes) // PARALLEL_PARSE_WORKERS or 1),
+        'clean_dialogue_text': lambda: [core.clean_dialogue_text(line) for line in lines],
+        'srt_docx_python_docx': lambda: core.process_srt_to_docx(
+            io.BytesIO(srt_bytes), "benchmark", core.DOCX_ENGINE_PYTHON_DOCX),
+        'srt_docx_ooxml': lambda: core.process_srt_to_docx(
+            io.BytesIO(srt_bytes), "benchmark", core.DOCX_ENGINE_OOXML),
+        'srt_xlsx': lambda: core.srt_to_xlsx_bytes(io.BytesIO(srt_bytes)),
+        'srt_parquet': lambda: core.srt_to_export_bytes(io.BytesIO(srt_bytes), 'parquet'),
+        'srt_csv': lambda: core.srt_to_export_bytes(io.BytesIO(srt_bytes), 'csv'),
+        'srt_jsonl': lambda: core.srt_to_export_bytes(io.BytesIO(srt_bytes), 'jsonl'),
+        'srt_xlsx_incremental': incremental_xlsx_stage(srt_bytes),
+        'retime_srt': lambda: core.retime_srt(
+            io.BytesIO(srt_bytes), scale=core.fps_scale_factor(23.976, 25), offset_ms=-500, min_gap_ms=40),
+        'process_docx': lambda: core.process_docx(io.BytesIO(docx_bytes), "benchmark"),
+    }
+
+def measure(stage, repeat):
+    """Returns (best wall seconds over `repeat` runs, peak traced MiB of one extra run)."""
+    stage()  # warm-up: imports, caches, templates
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        stage()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipelines.")
+    parser.add_argument('--cues', type=int, default=2000)
+    parser.add_argument('--speakers-per-cue', type=int, default=1)
+    parser.add_argument('--tag-density', type=float, default=0.1)
+    parser.add_argument('--multi-speaker-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', help="Comma-separated subset of stages to run (default: all).")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline JSON to compare with / save to.")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline.")
+    parser.add_argument('--max-regression', type=float, help="Fail if a stage is this many percent slower than the baseline.")
+    args = parser.parse_args(argv)
+
+    config = {
+        'cues': args.cues, 'speakers_per_cue': args.speakers_per_cue, 'tag_density': args.tag_density,
+        'multi_speaker_ratio': args.multi_speaker_ratio, 'seed': args.seed,
+    }
+    srt_options = {key: value for key, value in config.items() if key not in ('cues', 'seed')}
+    srt_bytes = make_srt(cues=args.cues, seed=args.seed, **srt_options)
+    corpus = {
+        'srt': srt_bytes,
+        'docx': make_docx(cues=args.cues, seed=args.seed, **srt_options),
+        'lines': dialogue_lines(srt_bytes),
+    }
+
+    stages = build_stages(corpus)
+    selected = args.stages.split(',') if args.stages else list(stages)
+    unknown = [name for name in selected if name not in stages]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(stages)})")
+
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get('config') != config:
+        print("note: baseline was recorded with a different corpus config; deltas are not comparable.")
+        baseline = None
+
+    print(f"corpus: {args.cues} cues, {len(srt_bytes) / 1024:.0f} KiB SRT, {len(corpus['lines'])} dialogue lines; best of {args.repeat}")
+    print(f"{'stage':<22}{'seconds':>10}{'cues/s':>12}{'peak MiB':>10}{'vs baseline':>13}")
+
+    results = {}
+    regressions = []
+    for name in selected:
+        seconds, peak_mib = measure(stages[name], args.repeat)
+        results[name] = {'seconds': round(seconds, 6), 'cues_per_sec': round(args.cues / seconds, 1),
+                         'peak_mib': round(peak_mib, 2)}
+
+        delta = ''
+        previous = (baseline or {}).get('results', {}).get(name)
+        if previous:
+            change = (seconds - previous['seconds']) / previous['seconds'] * 100
+            delta = f"{change:+.1f}%"
+            if args.max_regression is not None and change > args.max_regression:
+                regressions.append(name)
+        print(f"{name:<22}{seconds:>10.3f}{args.cues / seconds:>12.0f}{peak_mib:>10.1f}{delta:>13}")
+
+    if args.save_baseline:
+        stored = load_baseline(args.baseline) or {}
+        if stored.get('config') != config:
+            stored = {'config': config, 'results': {}}
+        stored['python'] = sys.version.split()[0]
+        stored['results'].update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(stored, handle, indent=2, sort_keys=True)
+            handle.write('\n')
+        print(f"baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"regression over {args.max_regression}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Headless command-line entry point for the toolkit conversions (no Streamlit required).
+
+Examples:
+    python cli.py srt-docx episode.srt --engine ooxml
+    python cli.py srt-xlsx season/*.srt -o exports/ --jobs 4
+    python cli.py format-docx script.docx
+    python cli.py retime episode.srt --fps-from 23.976 --fps-to 25 --min-gap-ms 40
+    python cli.py srt-docx episode.srt --offset-ms -1500
+    python cli.py srt-xlsx long.srt --diagnostics --profile-dir profiles/
+    python cli.py srt-xlsx archive_transcript.srt --parse-workers 8
+    python cli.py srt-parquet archive/*.srt -o analytics/ --jobs 8
+    python cli.py srt-docx delivery/*.srt --cache-dir /var/cache/toolkit --cache-max-mb 4096
+"""
+import argparse
+import os
+import sys
+
+import artifacts
+import profiling
+
+from core import (
+    ANALYSIS_CONVERSIONS, CONVERSIONS, DOCX_ENGINE_PYTHON_DOCX, DOCX_ENGINE_OOXML, SpeakerClassifier,
+    fps_scale_factor, parse_timecode, unique_output_name,
+)
+
+# CLI command -> conversion kind (see core.CONVERSIONS)
+COMMANDS = {
+    'srt-docx': 'srt_docx',
+    'srt-xlsx': 'srt_xlsx',
+    'srt-parquet': 'srt_parquet',
+    'srt-csv': 'srt_csv',
+    'srt-jsonl': 'srt_jsonl',
+    'format-docx': 'docx_format',
+    'retime': 'srt_retime',
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Subtitle & Script Toolkit (headless).")
+    parser.add_argument('command', choices=COMMANDS, help="Conversion to run.")
+    parser.add_argument('inputs', nargs='+', help="Input files.")
+    parser.add_argument('-o', '--output-dir', default='.', help="Directory for the converted files (default: current).")
+    parser.add_argument('--engine', choices=(DOCX_ENGINE_PYTHON_DOCX, DOCX_ENGINE_OOXML), default=DOCX_ENGINE_OOXML,
+                        help="SRT to Word engine (srt-docx only).")
+    parser.add_argument('--non-speaker-phrases', metavar='FILE',
+                        help="Extra phrases (one per line) never treated as speaker names (srt-xlsx/parquet/csv/jsonl).")
+    parser.add_argument('--parse-workers', type=int, metavar='N',
+                        help="Parse each SRT in N worker processes (srt-xlsx/parquet/csv/jsonl; for very large files).")
+    timing = parser.add_argument_group("timing changes (SRT inputs; applied before converting)")
+    timing.add_argument('--offset-ms', type=int, default=0, help="Shift every cue by this many ms (negative = earlier).")
+    timing.add_argument('--fps-from', type=float, help="Frame rate the subtitles were timed for (e.g. 23.976).")
+    timing.add_argument('--fps-to', type=float, help="Frame rate of the target video (e.g. 25).")
+    timing.add_argument('--resync', nargs=2, metavar='SUB=REAL',
+                        help="Two-point resync: two HH:MM:SS,mmm=HH:MM:SS,mmm pairs (subtitle time=correct time).")
+    timing.add_argument('--min-gap-ms', type=int,
+                        help="Fix overlaps: end each cue at least this many ms before the next one starts.")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="Convert several files in parallel worker processes.")
+    parser.add_argument('--diagnostics', action='store_true',
+                        help="Log per-stage timings, counts and memory deltas as JSON lines on stderr.")
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help="Also run each conversion under cProfile and write a .prof dump per file to DIR.")
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help=f"Reuse outputs of earlier runs stored in DIR (default: ${artifacts.ARTIFACT_CACHE_DIR_ENV}, if set).")
+    parser.add_argument('--cache-max-mb', type=float,
+                        help=f"Size cap of the cache directory in MiB (default: ${artifacts.ARTIFACT_CACHE_MAX_MB_ENV} or "
+                             f"{artifacts.DEFAULT_ARTIFACT_CACHE_MAX_BYTES // 2**20}).")
+    return parser
+
+def timing_options(args, parser):
+    """apply_timing_edits keywords from the timing arguments ({} when none are given)."""
+    timing = {}
+    if args.offset_ms:
+        timing['offset_ms'] = args.offset_ms
+    if (args.fps_from is None) != (args.fps_to is None):
+        parser.error("--fps-from and --fps-to must be given together")
+    if args.fps_from is not None:
+        timing['scale'] = fps_scale_factor(args.fps_from, args.fps_to)
+    if args.resync:
+        if not all('=' in point for point in args.resync):
+            parser.error("--resync points must look like SUB=REAL")
+        try:
+            timing['resync'] = tuple(tuple(parse_timecode(part) for part in point.split('=', 1)) for point in args.resync)
+        except ValueError as e:
+            parser.error(f"--resync: {e}")
+    if args.min_gap_ms is not None:
+        timing['min_gap_ms'] = args.min_gap_ms
+    return timing
+
+def convert_path(kind, path, options, diagnostics=False, profile_dir=None, cache_dir=None, cache_max_bytes=None):
+    """
+    Converts one file from disk, streaming it from an open handle (stages recorded per file).
+    cache_dir: artifact cache directory to reuse outputs from (None: no cache).
+    """
+    if diagnostics:
+        # Also in worker processes, which don't share the parent's logging setup
+        profiling.configure_logging()
+    cache = None
+    if cache_dir:
+        cache = artifacts.ArtifactCache(cache_dir, cache_max_bytes or artifacts.configured_max_bytes())
+    with profiling.record(kind, profile_dir=profile_dir, file=os.path.basename(path)), open(path, 'rb') as source:
+        return artifacts.cached_convert(kind, source, path, cache=cache, **options)
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    kind = COMMANDS[args.command]
+    extension = CONVERSIONS[kind][0]
+    options = {'engine': args.engine} if kind == 'srt_docx' else {}
+    if kind in ANALYSIS_CONVERSIONS and args.non_speaker_phrases:
+        options['speaker_classifier'] = SpeakerClassifier.from_file(args.non_speaker_phrases)
+    if kind in ANALYSIS_CONVERSIONS and args.parse_workers:
+        options['workers'] = args.parse_workers
+    timing = timing_options(args, parser)
+    if timing and extension != '.srt':
+        parser.error("timing changes only apply to SRT inputs")
+    if timing:
+        options['timing'] = timing
+
+    for path in args.inputs:
+        if not path.lower().endswith(extension):
+            print(f"warning: {path} does not look like a {extension} file", file=sys.stderr)
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache_dir = args.cache_dir or os.environ.get(artifacts.ARTIFACT_CACHE_DIR_ENV)
+    cache_max_bytes = int(args.cache_max_mb * 2**20) if args.cache_max_mb else None
+    run_options = (args.diagnostics, args.profile_dir, cache_dir, cache_max_bytes)
+
+    if args.jobs > 1 and len(args.inputs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [(path, pool.submit(convert_path, kind, path, options, *run_options))
+                       for path in args.inputs]
+            results = [(path, future.exception() or future.result()) for path, future in futures]
+    else:
+        results = []
+        for path in args.inputs:
+            try:
+                results.append((path, convert_path(kind, path, options, *run_options)))
+            except Exception as e:
+                results.append((path, e))
+
+    failures = 0
+    used_names = set()
+    for path, result in results:
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"error: {path}: {result}", file=sys.stderr)
+            continue
+        output_name, data = result
+        # Inputs from different folders can share a base name (a/ep1.srt, b/ep1.srt)
+        output_path = os.path.join(args.output_dir, unique_output_name(output_name, used_names))
+        with open(output_path, 'wb') as output:
+            output.write(data)
+        print(output_path)
+
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1791 @@
+"""
+Conversion core of the Subtitle & Script Toolkit (SRT to Word, SRT to Excel, Word script formatting).
+
+Importable without Streamlit: heavy dependencies (pandas, pysrt, python-docx) are imported inside
+the functions that need them, so headless callers only pay for the formats they actually produce.
+"""
+import re
+import io
+import codecs
+import os
+import random
+import zlib
+import zipfile
+from array import array
+from functools import lru_cache
+from xml.sax.saxutils import escape as xml_escape
+
+import profiling
+
+# --- GLOBAL CONFIGURATION (Unified) ---
+TARGET_FONT = 'Times New Roman'
+TARGET_SIZE = 12  # pt
+MAX_SPEAKER_NAME_LENGTH = 35 
+MAX_SPEAKER_NAME_WORDS = 4 
+
+# SRT to Word output engines (see process_srt_to_docx)
+DOCX_ENGINE_PYTHON_DOCX = 'python-docx'
+DOCX_ENGINE_OOXML = 'ooxml'
+
+# SRT to Excel export engines (see dataframe_to_xlsx_bytes)
+XLSX_ENGINE_STREAMING = 'streaming'
+XLSX_ENGINE_PANDAS = 'pandas'
+SRT_COLUMNS = ['Start', 'End', 'Speaker', 'Dialogue']
+SRT_MS_COLUMNS = ['Start ms', 'End ms']
+XLSX_TIME_COLUMNS = ['Start Time', 'End Time', 'Duration']
+XLSX_TIME_FORMAT = '[h]:mm:ss.000'
+
+# List of common non-speaker phrases (from srt-excel-converter-app.py)
+NON_SPEAKER_PHRASES = [
+    "the only problem", "note", "warning", "things", "and on the way we came across this", 
+    "this is the highest swing in europe", "and i swear", "which meant", "the only thing is", 
+    "and remember", "official distance", "first and foremost", "i said", 
+    "here we go", "next up", "step 1", "step 2", "step 3", "and step 3", "first up", 
+    "so the question is", "i was growing up", "you might be wondering", "update", 
+    "nashville to miami", "all i know is", "unlike judy", "the good news is", 
+    "aer lingus seat", "the true test is", "just as i suspected", "like i said", 
+    "star review and said", "i told them all", "and best of all", "the point is", 
+    "americans", "i was thinking", "and they go", "first of all", "second", 
+    "are you like", "as a reminder", "round 2", "round 1", "round 3", "round 4", 
+    "round 5", "welcome to round 3", "the question is", "quick reminder", 
+    "in 2nd place", "coming up", "first stop", "next step", "and that means", 
+    "hashtag", "so to be clear", "your second word", "welcome to round 6", 
+    "battle finale time", "number 1", "number 2", "but the truth is", 
+    "score to beat", "and your winner", "\"crafty\" and \"betcha\". coming up", 
+    "next one", "keep in mind", "and it says", "you could say", "welcome to round 2", 
+    "and the best part", "onto round 2", "the ride we chose", "good news is", 
+    "bad news", "good news", "he thought", "3 teams remain"
+]
+
+
+# Shared Regexes for Word Formatter (from word-editor-app-app.py)
+SPEAKER_REGEX = re.compile(r"^([A-Z][a-z\s&]+):\s*", re.IGNORECASE)
+TIMECODE_REGEX = re.compile(r"^\d{2}:\d{2}:\d{2},\d{3}\s+-->\s+\d{2}:\d{2}:\d{2},\d{3}$")
+HTML_CONTENT_REGEX = re.compile(r"((?:</?[ibu]>)+)(.*?)(?:</?[ibu]>)+", re.IGNORECASE | re.DOTALL) 
+
+# Color variables for Word Formatter (from word-editor-app-app.py)
+def generate_vibrant_rgb_colors(count=150, seed=None):
+    """Generates a list of highly saturated, distinct RGB colors (reproducible order when seeded)."""
+    rng = random.Random(seed)
+    colors = []
+    seen = set()
+    while len(colors) < count:
+        h = rng.random(); s = 0.8; v = 0.9 
+        if s == 0.0: r = g = b = v
+        else:
+            i = int(h * 6.0); f = h * 6.0 - i; p = v * (1.0 - s); q = v * (1.0 - s * f); t = v * (1.0 - s * (1.0 - f))
+            if i % 6 == 0: r, g, b = v, t, p
+            elif i % 6 == 1: r, g, b = q, v, p
+            elif i % 6 == 2: r, g, b = p, v, t
+            elif i % 6 == 3: r, g, b = p, q, v
+            elif i % 6 == 4: r, g, b = t, p, v
+            else: r, g, b = v, p, q
+        r, g, b = int(r * 255), int(g * 255), int(b * 255)
+        if (r < 50 and g < 50 and b < 50) or (r > 200 and g > 200 and b > 200): continue 
+        if (r, g, b) in seen: continue
+        seen.add((r, g, b))
+        colors.append((r, g, b))
+    return colors
+
+# Fixed seed so every process (and every run) builds the same palette
+SPEAKER_PALETTE_SEED = 150
+
+@lru_cache(maxsize=1)
+def speaker_palette_rgb():
+    """The 150-color speaker palette, generated on first use rather than at import."""
+    return tuple(generate_vibrant_rgb_colors(150, seed=SPEAKER_PALETTE_SEED))
+
+class SpeakerColorAllocator:
+    """
+    Assigns font colors to speaker names for one document (for Word Formatter).
+    Create one per document/session instead of sharing state, so concurrent process_docx calls don't interfere.
+    A speaker's preferred palette slot is a stable hash of the name, so the same speaker gets the same color
+    across runs; if another speaker in the same document already holds that slot, the next free slot is used.
+    """
+
+    def __init__(self, palette_rgb=None):
+        from docx.shared import RGBColor
+
+        palette_rgb = speaker_palette_rgb() if palette_rgb is None else palette_rgb
+        self.palette = [RGBColor(r, g, b) for r, g, b in palette_rgb]
+        self.speaker_colors = {}
+        self._taken_slots = set()
+
+    def get_color(self, speaker_name):
+        """Returns the RGBColor assigned to speaker_name, assigning one on first use."""
+        color = self.speaker_colors.get(speaker_name)
+        if color is not None:
+            return color
+        if not self.palette:
+            # Fallback to black if color generation fails
+            from docx.shared import RGBColor
+            return RGBColor(0, 0, 0)
+
+        slot = zlib.crc32(speaker_name.encode('utf-8')) % len(self.palette)
+        if len(self._taken_slots) < len(self.palette):
+            while slot in self._taken_slots:
+                slot = (slot + 1) % len(self.palette)
+        self._taken_slots.add(slot)
+
+        color = self.palette[slot]
+        self.speaker_colors[speaker_name] = color
+        return color
+
+# --- CORE LOGIC FUNCTIONS ---
+
+# 0. SRT INPUT (streaming reader shared by the SRT pipelines)
+# Encoding detection: BOMs, then UTF-16 without BOM (NUL byte pattern), then UTF-8, else an 8-bit
+# code page - decided once from the head of the file, so the stream is decoded a single time.
+SRT_ENCODING_SAMPLE_BYTES = 64 * 1024
+CP1252_UNDEFINED_BYTES = frozenset(b'\x81\x8d\x8f\x90\x9d')
+TEXT_DECODE_ERRORS = 'toolkit-cp1252-fallback'
+
+def _cp1252_fallback(error):
+    """Decode error handler: bytes that aren't valid in the detected encoding are read as cp1252 (or latin-1)."""
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    bad = error.object[error.start:error.end]
+    return ''.join(bytes([byte]).decode('latin-1' if byte in CP1252_UNDEFINED_BYTES else 'cp1252') for byte in bad), error.end
+
+codecs.register_error(TEXT_DECODE_ERRORS, _cp1252_fallback)
+
+TEXT_ENCODE_ERRORS = 'toolkit-cp1252-restore'
+
+def _cp1252_restore(error):
+    """
+    Encode error handler reversing _cp1252_fallback: the C1 code points it reads cp1252's undefined
+    bytes as (0x81 -> U+0081) are written back as those bytes, so re-encoding in cp1252 round-trips.
+    """
+    if not isinstance(error, UnicodeEncodeError):
+        raise error
+    unencodable = error.object[error.start:error.end]
+    if not all(0x80 <= ord(char) <= 0x9f for char in unencodable):
+        raise error
+    return unencodable.encode('latin-1'), error.end
+
+codecs.register_error(TEXT_ENCODE_ERRORS, _cp1252_restore)
+
+def detect_encoding(head, complete=False):
+    """
+    Guesses the text encoding of a byte sample (the head of a file; complete=True if it's the whole file).
+    Returns 'utf-8-sig', 'utf-16' (BOM), 'utf-16-le'/'utf-16-be' (no BOM), 'utf-8', 'cp1252' or 'latin-1'.
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+
+    # UTF-16 without BOM: mostly-ASCII text has a NUL in every other byte
+    if len(head) >= 4:
+        even_nuls = head[0::2].count(0)
+        odd_nuls = head[1::2].count(0)
+        half = len(head) // 2
+        if odd_nuls > half * 0.3 and even_nuls < half * 0.05:
+            return 'utf-16-le'
+        if even_nuls > half * 0.3 and odd_nuls < half * 0.05:
+            return 'utf-16-be'
+
+    try:
+        # Incremental: a multi-byte character cut off at the end of the sample is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=complete)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    return 'latin-1' if CP1252_UNDEFINED_BYTES.intersection(head) else 'cp1252'
+
+def detect_stream_encoding(stream):
+    """detect_encoding() on the head of a seekable binary stream (the stream is rewound)."""
+    stream.seek(0)
+    head = stream.read(SRT_ENCODING_SAMPLE_BYTES + 1)
+    stream.seek(0)
+    return detect_encoding(head[:SRT_ENCODING_SAMPLE_BYTES], complete=len(head) <= SRT_ENCODING_SAMPLE_BYTES)
+
+def decode_text(data):
+    """Decodes a whole upload (bytes) with the detected encoding."""
+    return data.decode(detect_encoding(data, complete=True), errors=TEXT_DECODE_ERRORS)
+
+def iter_srt_lines(stream, encoding=None, newline='\n'):
+    """
+    Yields decoded text lines from a binary SRT stream (e.g. a Streamlit upload) 
+    without reading the whole file into memory.
+    encoding: None to detect it from the head of the stream (see detect_encoding).
+    """
+    if encoding is None:
+        encoding = detect_stream_encoding(stream)
+    stream.seek(0)
+    text_stream = io.TextIOWrapper(stream, encoding=encoding, errors=TEXT_DECODE_ERRORS, newline=newline)
+    try:
+        yield from text_stream
+    finally:
+        # Detach so closing the wrapper does not close the caller's stream
+        text_stream.detach()
+
+def iter_srt_stream_blocks(stream, encoding=None):
+    """Groups the lines of a binary SRT stream into cue blocks, holding only one block in memory."""
+    block_lines = []
+    for line in iter_srt_lines(stream, encoding):
+        if line.strip():
+            block_lines.append(line)
+        elif block_lines:
+            yield ''.join(block_lines)
+            block_lines = []
+    if block_lines:
+        yield ''.join(block_lines)
+
+def iter_srt_cues(stream, encoding=None):
+    """Yields pysrt SubRipItem cues one at a time from a binary SRT stream."""
+    import pysrt
+
+    # Universal newlines to match pysrt.from_string (str.splitlines) line handling
+    return pysrt.stream(iter_srt_lines(stream, encoding, newline=None))
+
+# 1. SRT TO WORD (from srttowordapp.py)
+def set_font_and_size(run, font_name, font_size):
+    """Applies Font and Size to a specific run."""
+    run.font.name = font_name
+    run.font.size = font_size
+
+def process_srt_to_docx(uploaded_file, file_name_without_ext, engine=DOCX_ENGINE_PYTHON_DOCX):
+    """Reads SRT file and converts it to DOCX with basic formatting."""
+    
+    if engine == DOCX_ENGINE_OOXML:
+        return process_srt_to_docx_ooxml(uploaded_file, file_name_without_ext)
+
+    from docx import Document
+    from docx.shared import Pt
+
+    document = Document()
+    
+    document.add_heading(f"SRT Conversion: {file_name_without_ext}", level=1)
+
+    with profiling.stage('build_document', engine=engine) as info:
+        cues = 0
+        for sub in iter_srt_cues(uploaded_file):
+            cues += 1
+            # Add Index
+            p_index = document.add_paragraph(f"{sub.index}")
+            set_font_and_size(p_index.runs[0], TARGET_FONT, Pt(TARGET_SIZE))
+            p_index.paragraph_format.space_after = Pt(0) 
+
+            # Add Timecode
+            timecode_str = f"{sub.start} --> {sub.end}"
+            p_timecode = document.add_paragraph(timecode_str)
+            set_font_and_size(p_timecode.runs[0], TARGET_FONT, Pt(TARGET_SIZE))
+            p_timecode.paragraph_format.space_after = Pt(0)
+        
+            # Add Content (cleans up tags using pysrt)
+            p_content = document.add_paragraph(sub.text_without_tags)
+            if p_content.runs:
+                set_font_and_size(p_content.runs[0], TARGET_FONT, Pt(TARGET_SIZE))
+            p_content.paragraph_format.space_after = Pt(12)
+        info['cues'] = cues
+
+    with profiling.stage('save_document') as info:
+        modified_file = io.BytesIO()
+        document.save(modified_file)
+        info['bytes'] = modified_file.tell()
+    modified_file.seek(0)
+    
+    return modified_file
+
+# 1b. SRT TO WORD - direct OOXML fast path
+# Same layout as process_srt_to_docx, but word/document.xml is streamed straight into the
+# zip and fonts/spacing come from two shared paragraph styles instead of per-run properties.
+XML_INVALID_CHARS_REGEX = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+OOXML_RUN_BREAK_REGEX = re.compile(r'([\t\r\n])')
+
+@lru_cache(maxsize=1)
+def srt_docx_ooxml_template():
+    """
+    Builds (once) the package used by the OOXML writer: a blank python-docx document with
+    the 'SRT Line' (index/timecode) and 'SRT Content' paragraph styles.
+    Returns (template_bytes, document_xml_head, document_xml_tail, line_style_id, content_style_id).
+    """
+    from docx import Document
+    from docx.shared import Pt
+    from docx.enum.style import WD_STYLE_TYPE
+
+    document = Document()
+
+    line_style = document.styles.add_style('SRT Line', WD_STYLE_TYPE.PARAGRAPH)
+    line_style.base_style = document.styles['Normal']
+    line_style.font.name = TARGET_FONT
+    line_style.font.size = Pt(TARGET_SIZE)
+    line_style.paragraph_format.space_after = Pt(0)
+
+    content_style = document.styles.add_style('SRT Content', WD_STYLE_TYPE.PARAGRAPH)
+    content_style.base_style = line_style
+    content_style.paragraph_format.space_after = Pt(12)
+
+    template = io.BytesIO()
+    document.save(template)
+    with zipfile.ZipFile(template) as package:
+        document_xml = package.read('word/document.xml').decode('utf-8')
+
+    body_start = document_xml.index('<w:body>') + len('<w:body>')
+    body_end = document_xml.index('<w:sectPr', body_start)
+    return (template.getvalue(), document_xml[:body_start], document_xml[body_end:],
+            line_style.style_id, content_style.style_id)
+
+def ooxml_paragraph(style_id, text):
+    """Renders one w:p element; tabs and line breaks become w:tab / w:br like python-docx runs."""
+    parts = [f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>']
+    if text:
+        parts.append('<w:r>')
+        for piece in OOXML_RUN_BREAK_REGEX.split(XML_INVALID_CHARS_REGEX.sub('', text)):
+            if piece == '\t':
+                parts.append('<w:tab/>')
+            elif piece in ('\r', '\n'):
+                parts.append('<w:br/>')
+            elif piece:
+                parts.append(f'<w:t xml:space="preserve">{xml_escape(piece)}</w:t>')
+        parts.append('</w:r>')
+    parts.append('</w:p>')
+    return ''.join(parts)
+
+def process_srt_to_docx_ooxml(uploaded_file, file_name_without_ext):
+    """Reads SRT file and streams the DOCX body directly into the zip (fast path of process_srt_to_docx)."""
+    template, document_head, document_tail, line_style_id, content_style_id = srt_docx_ooxml_template()
+
+    modified_file = io.BytesIO()
+    with profiling.stage('write_document', engine=DOCX_ENGINE_OOXML) as info:
+        cues = 0
+        with zipfile.ZipFile(io.BytesIO(template)) as source, \
+                zipfile.ZipFile(modified_file, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                if item.filename != 'word/document.xml':
+                    target.writestr(item, source.read(item.filename))
+                    continue
+
+                with target.open('word/document.xml', 'w') as body:
+                    body.write(document_head.encode('utf-8'))
+                    body.write(ooxml_paragraph('Heading1', f"SRT Conversion: {file_name_without_ext}").encode('utf-8'))
+
+                    for sub in iter_srt_cues(uploaded_file):
+                        cues += 1
+                        body.write((
+                            ooxml_paragraph(line_style_id, f"{sub.index}")
+                            + ooxml_paragraph(line_style_id, f"{sub.start} --> {sub.end}")
+                            + ooxml_paragraph(content_style_id, sub.text_without_tags)
+                        ).encode('utf-8'))
+
+                    body.write(document_tail.encode('utf-8'))
+        info['cues'] = cues
+        info['bytes'] = modified_file.tell()
+
+    modified_file.seek(0)
+    return modified_file
+
+# 2. SRT TO EXCEL (from srt-excel-converter-app.py)
+
+# Any tag; group 1 marks closing tags, group 2 is the tag name (e.g. 'i' for <i>, </I>, <i class="x">).
+# A tag needs a name and can't contain another '<', so a literal '<' ('I <3 you', '3 < 4') stays text.
+DIALOGUE_TAG_REGEX = re.compile(r'<(/?)([A-Za-z]+)[^<>]*>')
+PARENTHESIZED_TAGS = frozenset(('i', 'b', 'u'))
+
+def clean_dialogue_text(text):
+    """
+    Converts HTML/XML style formatting tags (i, b, u) to text enclosed in parentheses ().
+    Removes any other HTML/XML tags.
+    Done in a single scan over the tags: like one non-greedy substitution per tag name, an opening
+    i/b/u tag pairs with the next closing tag of the same name (a repeated opening tag in between is
+    dropped, so <i><i>a</i></i> gives '(a)'); pairs of different names nest or interleave around
+    their own tags, and unmatched tags and all other tags are dropped. Whitespace is collapsed at the end.
+    """
+    if '<' not in text:
+        return ' '.join(text.split())
+
+    pieces = []
+    open_tags = {}  # tag name -> index of its pending placeholder in pieces
+    pos = 0
+    for match in DIALOGUE_TAG_REGEX.finditer(text):
+        pieces.append(text[pos:match.start()])
+        pos = match.end()
+
+        name = match.group(2).lower()
+        if name not in PARENTHESIZED_TAGS: continue
+
+        if not match.group(1):
+            if name not in open_tags:
+                open_tags[name] = len(pieces)
+                pieces.append('')  # becomes '(' once the tag is closed
+        elif name in open_tags:
+            pieces[open_tags.pop(name)] = '('
+            pieces.append(')')
+
+    pieces.append(text[pos:])
+    return ' '.join(''.join(pieces).split())
+
+# Verdict cache bound for SpeakerClassifier (distinct tags; real files repeat a few speakers)
+SPEAKER_VERDICT_CACHE_SIZE = 65536
+
+def parse_non_speaker_phrases(text):
+    """Extra non-speaker phrases from text: one phrase per line, '#' starts a comment line."""
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+
+def load_non_speaker_phrases(path):
+    """Reads extra non-speaker phrases from a text file (see parse_non_speaker_phrases)."""
+    with open(path, 'rb') as phrases_file:
+        return parse_non_speaker_phrases(decode_text(phrases_file.read()))
+
+class SpeakerClassifier:
+    """
+    Memoized speaker-tag classifier behind is_valid_speaker_tag.
+    Non-speaker phrases (built-in plus any extra ones) live in a frozenset, and the verdict for each
+    distinct tag is cached, so repeated speakers cost one dict lookup regardless of the phrase count.
+    """
+
+    def __init__(self, extra_phrases=()):
+        self.non_speaker_phrases = frozenset(
+            phrase.strip().lower() for phrase in (*NON_SPEAKER_PHRASES, *extra_phrases) if phrase.strip()
+        )
+        self._verdicts = {}
+
+    @classmethod
+    def from_file(cls, path):
+        """Classifier with the built-in phrases plus those listed in a user-supplied file."""
+        return cls(load_non_speaker_phrases(path))
+
+    def is_speaker(self, tag):
+        """Checks if a tag is likely a speaker name using linguistic heuristics (cached per tag)."""
+        verdict = self._verdicts.get(tag)
+        if verdict is None:
+            if len(self._verdicts) >= SPEAKER_VERDICT_CACHE_SIZE:
+                self._verdicts.clear()
+            verdict = self._verdicts[tag] = self._classify(tag)
+        return verdict
+
+    def _classify(self, tag):
+        tag = tag.strip()
+        if not tag: return False
+        if len(tag) > MAX_SPEAKER_NAME_LENGTH: return False
+        if tag.lower() in self.non_speaker_phrases: return False
+        words = tag.replace(' and ', ' ').replace(' and', '').replace('&', ' ').split()
+        if not words or len(words) > MAX_SPEAKER_NAME_WORDS: return False
+        first_char = words[0][0]
+        if first_char.isalpha() and first_char.islower(): return False
+        return True
+
+DEFAULT_SPEAKER_CLASSIFIER = SpeakerClassifier()
+
+def is_valid_speaker_tag(tag):
+    """Checks if a tag is likely a speaker name using linguistic heuristics."""
+    return DEFAULT_SPEAKER_CLASSIFIER.is_speaker(tag)
+
+# Precompiled patterns for the single-pass SRT tokenizer (parse_srt)
+SRT_BLOCK_SEPARATOR_REGEX = re.compile(r'\n\s*\n')
+SRT_TIMECODE_LINE_REGEX = re.compile(r'\s*(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})')
+SRT_SPEAKER_SEGMENT_REGEX = re.compile(r'((?:[\w\s&]+?): )')
+
+def _iter_srt_text_blocks(srt_content):
+    """Yields the cue blocks of an SRT text lazily (same boundaries as splitting on blank lines)."""
+    text = srt_content.strip()
+    pos = 0
+    for match in SRT_BLOCK_SEPARATOR_REGEX.finditer(text):
+        yield text[pos:match.start()]
+        pos = match.end()
+    yield text[pos:]
+
+def _iter_line_segments(line):
+    """Yields the same text/speaker-tag segments as SRT_SPEAKER_SEGMENT_REGEX.split(line), lazily."""
+    pos = 0
+    for match in SRT_SPEAKER_SEGMENT_REGEX.finditer(line):
+        yield line[pos:match.start()]
+        yield match.group(1)
+        pos = match.end()
+    yield line[pos:]
+
+def _srt_block_cue(block):
+    """
+    Locates the parts of a stripped cue block: line 1 is the index, line 2 the timecode, line 3+ the
+    dialogue. Returns (timecode_line_start, dialogue_start, time_start, time_end), or None if the
+    block is not a cue.
+    """
+    index_end = block.find('\n')
+    if index_end < 0: return None
+    time_line_end = block.find('\n', index_end + 1)
+    if time_line_end < 0: return None
+
+    time_match = SRT_TIMECODE_LINE_REGEX.match(block, index_end + 1, time_line_end)
+    if not time_match: return None
+    return index_end + 1, time_line_end + 1, time_match.group(1), time_match.group(2)
+
+def _srt_cue_rows(block, dialogue_start, time_start, time_end, is_speaker, last_known_speaker, last_row_start):
+    """
+    Rows of one cue (from the dialogue lines of its block) given the parser state carried over from
+    the previous cues. Returns (rows, last_known_speaker, last_row_start, settled) - the state after
+    this cue, and whether a tagged line set that state (it then no longer depends on the state passed in).
+    """
+    rows = []
+    settled = False
+    current_dialogue = ""
+    block_initial_speaker = last_known_speaker
+    block_length = len(block)
+    line_start = dialogue_start
+
+    while line_start <= block_length:
+        line_end = block.find('\n', line_start)
+        if line_end < 0: line_end = block_length
+        line = block[line_start:line_end].strip()
+        line_start = line_end + 1
+        if not line: continue
+
+        segments = _iter_line_segments(line)
+        for segment in segments:
+            segment = segment.strip()
+            if not segment: continue
+
+            if segment.endswith(':') and len(segment) > 1:
+                speaker_tag = segment[:-1].strip()
+                dialogue_segment = next(segments, "").strip()
+
+                if is_speaker(speaker_tag):
+
+                    if current_dialogue:
+                        speaker_to_use = block_initial_speaker if last_row_start != time_start else last_known_speaker
+                        # IMPORTANT: Use clean_dialogue_text to remove tags for Excel output
+                        rows.append([time_start, time_end, speaker_to_use, clean_dialogue_text(current_dialogue)])
+                        last_known_speaker, last_row_start = speaker_to_use, time_start
+                        current_dialogue = ""
+
+                    if dialogue_segment:
+                        rows.append([time_start, time_end, speaker_tag, clean_dialogue_text(dialogue_segment)])
+                        last_known_speaker, last_row_start = speaker_tag, time_start
+                        settled = True
+
+                    if block_initial_speaker == last_known_speaker:
+                        block_initial_speaker = speaker_tag
+
+                else:
+                    recombined_text = segment + " " + dialogue_segment
+
+                    if current_dialogue: current_dialogue += " " + recombined_text
+                    else: current_dialogue = recombined_text
+
+            else:
+                if current_dialogue: current_dialogue += " " + segment
+                else: current_dialogue = segment
+
+    if current_dialogue:
+        speaker_to_use = block_initial_speaker if last_row_start != time_start else last_known_speaker
+        rows.append([time_start, time_end, speaker_to_use, clean_dialogue_text(current_dialogue)])
+        last_known_speaker, last_row_start = speaker_to_use, time_start
+
+    return rows, last_known_speaker, last_row_start, settled
+
+def _iter_srt_source_blocks(srt_source):
+    if isinstance(srt_source, str):
+        return _iter_srt_text_blocks(srt_source)
+    return iter_srt_stream_blocks(srt_source)
+
+def iter_srt_rows(srt_source, speaker_classifier=None):
+    """
+    Single-pass tokenizer behind parse_srt. Accepts SRT text or a binary stream,
+    walks it once and yields [Start, End, Speaker, Dialogue] rows one cue at a time,
+    without intermediate block/line lists.
+    speaker_classifier: SpeakerClassifier to use (e.g. with extra non-speaker phrases); default built-in.
+    """
+    is_speaker = (speaker_classifier or DEFAULT_SPEAKER_CLASSIFIER).is_speaker
+    last_known_speaker = "Unknown"
+    last_row_start = None
+
+    for block in _iter_srt_source_blocks(srt_source):
+        block = block.strip()
+        cue = _srt_block_cue(block)
+        if cue is None: continue
+        _, dialogue_start, time_start, time_end = cue
+
+        rows, last_known_speaker, last_row_start, _ = _srt_cue_rows(
+            block, dialogue_start, time_start, time_end, is_speaker, last_known_speaker, last_row_start
+        )
+        yield from rows
+
+def srt_timecode_to_ms(timecode):
+    """Converts an 'HH:MM:SS,mmm' timecode to integer milliseconds."""
+    return (int(timecode[0:2]) * 3600000 + int(timecode[3:5]) * 60000
+            + int(timecode[6:8]) * 1000 + int(timecode[9:12]))
+
+# Digit positions of 'HH:MM:SS,mmm' and their weight in milliseconds
+SRT_TIMECODE_DIGIT_WEIGHTS = ((0, 36000000), (1, 3600000), (3, 600000), (4, 60000), (6, 10000), (7, 1000),
+                              (9, 100), (10, 10), (11, 1))
+
+def parse_srt_timecodes(timecodes):
+    """
+    Vectorized srt_timecode_to_ms over a list of 'HH:MM:SS,mmm' str: the digits are read from a
+    fixed-width code point matrix with numpy instead of converting each timecode in Python.
+    Returns (int64 ms array, row indices whose text ms_to_srt_timecode would not reproduce -
+    minutes or seconds of 60 or more, or non-ASCII digits).
+    """
+    import numpy as np
+
+    if not timecodes:
+        return np.empty(0, np.int64), np.empty(0, np.intp)
+    codes = np.array(timecodes, dtype='U12').view(np.uint32).reshape(len(timecodes), 12).astype(np.int64)
+    positions = [position for position, _ in SRT_TIMECODE_DIGIT_WEIGHTS]
+    digits = codes[:, positions] - ord('0')
+    ms_values = digits @ np.array([weight for _, weight in SRT_TIMECODE_DIGIT_WEIGHTS], dtype=np.int64)
+
+    not_ascii = ((digits < 0) | (digits > 9)).any(axis=1)
+    for row in np.flatnonzero(not_ascii).tolist():
+        # \d also matches other Unicode digits, which int() understands
+        ms_values[row] = srt_timecode_to_ms(timecodes[row])
+    inexact = np.flatnonzero(not_ascii | (digits[:, 2] >= 6) | (digits[:, 4] >= 6))
+    return ms_values, inexact
+
+def ms_to_srt_timecode(milliseconds):
+    """Converts integer milliseconds to an 'HH:MM:SS,mmm' timecode."""
+    hours, milliseconds = divmod(int(milliseconds), 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+def format_srt_timecodes(ms_values):
+    """
+    Vectorized ms_to_srt_timecode over an integer array: the digits are written into a fixed-width
+    byte matrix with numpy instead of formatting each value in Python. Returns a list of str.
+    """
+    import numpy as np
+
+    ms_values = np.asarray(ms_values, dtype=np.int64)
+    if len(ms_values) and (ms_values.min() < 0 or ms_values.max() >= 100 * 3600000):
+        # Outside the 2-digit-hour range the fixed layout doesn't apply
+        return [ms_to_srt_timecode(ms) for ms in ms_values.tolist()]
+
+    hours, rest = np.divmod(ms_values, 3600000)
+    minutes, rest = np.divmod(rest, 60000)
+    seconds, millis = np.divmod(rest, 1000)
+    digits = np.empty((len(ms_values), 12), dtype=np.uint8)
+    zero = ord('0')
+    digits[:, 0] = hours // 10 + zero
+    digits[:, 1] = hours % 10 + zero
+    digits[:, 2] = ord(':')
+    digits[:, 3] = minutes // 10 + zero
+    digits[:, 4] = minutes % 10 + zero
+    digits[:, 5] = ord(':')
+    digits[:, 6] = seconds // 10 + zero
+    digits[:, 7] = seconds % 10 + zero
+    digits[:, 8] = ord(',')
+    digits[:, 9] = millis // 100 + zero
+    digits[:, 10] = millis // 10 % 10 + zero
+    digits[:, 11] = millis % 10 + zero
+    return digits.view('S12').ravel().astype(str).tolist()
+
+class CueTable:
+    """
+    Columnar store of parsed rows, filled directly by parse_srt: int64 millisecond Start/End arrays,
+    int32 speaker IDs into `speakers` (categorical) and a dialogue string column.
+    to_dataframe() wraps the arrays without copying them; timing_stats() works on them vectorized.
+    """
+
+    def __init__(self):
+        self.start_ms = array('q')
+        self.end_ms = array('q')
+        self.speaker_ids = array('i')
+        self.speakers = []
+        self.dialogue = []
+        # Row -> original text of the timecodes that don't round-trip through ms (e.g. '00:00:60,200')
+        self.start_text = {}
+        self.end_text = {}
+        self._speaker_index = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a table from [Start, End, Speaker, Dialogue] rows (e.g. iter_srt_rows)."""
+        table = cls()
+        speaker_ids, dialogues = table.speaker_ids, table.dialogue
+        speaker_index, speakers = table._speaker_index, table.speakers
+        starts, ends = [], []
+
+        for start, end, speaker, dialogue in rows:
+            speaker_id = speaker_index.get(speaker)
+            if speaker_id is None:
+                speaker_id = speaker_index[speaker] = len(speakers)
+                speakers.append(speaker)
+            starts.append(start)
+            ends.append(end)
+            speaker_ids.append(speaker_id)
+            dialogues.append(dialogue)
+
+        # Timecodes are converted in one vectorized pass; only the few that don't round-trip keep their text
+        for timecodes, ms_column, original_text in ((starts, table.start_ms, table.start_text),
+                                                    (ends, table.end_ms, table.end_text)):
+            ms_values, inexact = parse_srt_timecodes(timecodes)
+            ms_column.frombytes(ms_values.tobytes())
+            original_text.update((row, timecodes[row]) for row in inexact.tolist())
+        return table
+
+    def extend(self, other):
+        """Appends the rows of another table, mapping its speaker IDs onto this table's speakers."""
+        import numpy as np
+
+        speaker_map = []
+        for speaker in other.speakers:
+            speaker_id = self._speaker_index.get(speaker)
+            if speaker_id is None:
+                speaker_id = self._speaker_index[speaker] = len(self.speakers)
+                self.speakers.append(speaker)
+            speaker_map.append(speaker_id)
+        offset = len(self)
+        self.start_text.update((offset + row, text) for row, text in other.start_text.items())
+        self.end_text.update((offset + row, text) for row, text in other.end_text.items())
+        if other.speaker_ids:
+            other_ids = np.frombuffer(other.speaker_ids, dtype=np.int32)
+            self.speaker_ids.frombytes(np.asarray(speaker_map, dtype=np.int32)[other_ids].tobytes())
+        self.start_ms.extend(other.start_ms)
+        self.end_ms.extend(other.end_ms)
+        self.dialogue.extend(other.dialogue)
+
+    def iter_rows(self):
+        """Yields the rows back as [Start, End, Speaker, Dialogue] (timecodes as 'HH:MM:SS,mmm')."""
+        starts = self._timecode_column(self.start_ms, self.start_text)
+        ends = self._timecode_column(self.end_ms, self.end_text)
+        speakers = self.speakers
+        for start, end, speaker_id, dialogue in zip(starts, ends, self.speaker_ids, self.dialogue):
+            yield [start, end, speakers[speaker_id], dialogue]
+
+    def __len__(self):
+        return len(self.dialogue)
+
+    @staticmethod
+    def _timecode_column(ms_values, original_text):
+        """Start/End text of every row: formatted from ms, except rows whose original text is kept."""
+        timecodes = format_srt_timecodes(ms_values)
+        for row, text in original_text.items():
+            timecodes[row] = text
+        return timecodes
+
+    def to_dataframe(self):
+        """
+        DataFrame with the original Start/End/Speaker/Dialogue columns (Speaker categorical) plus
+        integer 'Start ms'/'End ms' columns that share memory with this table.
+        """
+        import numpy as np
+        import pandas as pd
+
+        start_ms = np.frombuffer(self.start_ms, dtype=np.int64) if self.start_ms else np.empty(0, np.int64)
+        end_ms = np.frombuffer(self.end_ms, dtype=np.int64) if self.end_ms else np.empty(0, np.int64)
+        speaker_ids = np.frombuffer(self.speaker_ids, dtype=np.int32) if self.speaker_ids else np.empty(0, np.int32)
+
+        return pd.DataFrame({
+            'Start': self._timecode_column(start_ms, self.start_text),
+            'End': self._timecode_column(end_ms, self.end_text),
+            'Speaker': pd.Categorical.from_codes(speaker_ids, categories=pd.Index(self.speakers, dtype=object)),
+            'Dialogue': self.dialogue,
+            SRT_MS_COLUMNS[0]: start_ms,
+            SRT_MS_COLUMNS[1]: end_ms,
+        }, copy=False)
+
+    def timing_stats(self):
+        import numpy as np
+
+        return timing_stats(np.asarray(self.start_ms, dtype=np.int64), np.asarray(self.end_ms, dtype=np.int64))
+
+def timing_stats(start_ms, end_ms):
+    """
+    Vectorized timing statistics over row-aligned Start/End millisecond arrays. Rows of the same cue
+    (multi-speaker cues share Start/End) are counted once; gaps are next start minus previous end.
+    """
+    import numpy as np
+
+    start_ms = np.asarray(start_ms, dtype=np.int64)
+    end_ms = np.asarray(end_ms, dtype=np.int64)
+    if len(start_ms):
+        new_cue = np.ones(len(start_ms), dtype=bool)
+        new_cue[1:] = (start_ms[1:] != start_ms[:-1]) | (end_ms[1:] != end_ms[:-1])
+        start_ms, end_ms = start_ms[new_cue], end_ms[new_cue]
+
+    durations = end_ms - start_ms
+    gaps = start_ms[1:] - end_ms[:-1]
+    overlaps = -gaps[gaps < 0]
+    return {
+        'cues': int(len(start_ms)),
+        'total_duration_ms': int(durations.sum()),
+        'mean_duration_ms': float(durations.mean()) if len(durations) else 0.0,
+        'min_gap_ms': int(gaps.min()) if len(gaps) else 0,
+        'overlap_count': int(len(overlaps)),
+        'overlap_total_ms': int(overlaps.sum()),
+        'max_overlap_ms': int(overlaps.max()) if len(overlaps) else 0,
+    }
+
+def parse_srt_table(srt_content, speaker_classifier=None, workers=None):
+    """
+    The rows of parse_srt as a CueTable.
+    workers: parse a large input in that many processes (see parse_srt_table_parallel); same result.
+    """
+    if workers and workers > 1:
+        return parse_srt_table_parallel(srt_content, speaker_classifier, workers)
+    with profiling.stage('parse_srt') as info:
+        table = CueTable.from_rows(iter_srt_rows(srt_content, speaker_classifier))
+        info['rows'] = len(table)
+    return table
+
+def parse_srt(srt_content, speaker_classifier=None, workers=None):
+    """
+    Parses SRT content (text or a binary stream) to extract Start, End timecodes, Speaker, and Dialogue 
+    (from srt-excel-converter-app.py - complex parser)
+    Rows are collected in a columnar CueTable, so the DataFrame also carries integer 'Start ms'/'End ms'.
+    workers: parse a large input in that many processes (see parse_srt_table_parallel); same result.
+    """
+    table = parse_srt_table(srt_content, speaker_classifier, workers)
+    with profiling.stage('build_dataframe', rows=len(table)):
+        return table.to_dataframe()
+
+# 2b. SUBTITLE TIMING EDITS (shift / frame-rate scale / two-point resync / overlap repair)
+COMMON_FRAME_RATES = [23.976, 24.0, 25.0, 29.97, 30.0]
+
+def fps_scale_factor(source_fps, target_fps):
+    """Time scale factor for a frame-rate conversion (e.g. 23.976 -> 25 speeds playback up)."""
+    return source_fps / target_fps
+
+def apply_timing_edits(start_ms, end_ms, offset_ms=0, scale=1.0, resync=None, min_gap_ms=None):
+    """
+    Applies timing edits to whole Start/End millisecond arrays at once (numpy, no per-cue loop).
+    Order: linear scale, two-point resync ((src1, dst1), (src2, dst2) in ms), offset, then clamping
+    at 0 and - if min_gap_ms is set - trimming each cue's end so it stops min_gap_ms before the
+    next cue starts (fixes overlaps; an end is never moved before its own start).
+    Returns new int64 (start, end) arrays.
+    """
+    import numpy as np
+
+    start = np.asarray(start_ms, dtype=np.float64) * scale
+    end = np.asarray(end_ms, dtype=np.float64) * scale
+
+    if resync:
+        (src1, dst1), (src2, dst2) = resync
+        if src1 == src2:
+            raise ValueError("Resync points must be at different times.")
+        slope = (dst2 - dst1) / (src2 - src1)
+        if slope <= 0:
+            raise ValueError("Resync points must keep the cues in order.")
+        start = dst1 + (start - src1) * slope
+        end = dst1 + (end - src1) * slope
+
+    start = np.maximum(np.rint(start + offset_ms), 0).astype(np.int64)
+    end = np.maximum(np.rint(end + offset_ms), 0).astype(np.int64)
+
+    if min_gap_ms is not None and len(start) > 1:
+        limit = start[1:] - min_gap_ms
+        end[:-1] = np.where(end[:-1] > limit, np.maximum(limit, start[:-1]), end[:-1])
+    return start, end
+
+def retime_srt(srt_source, encoding=None, **edits):
+    """
+    Rewrites the timecodes of an SRT (text or binary stream) with apply_timing_edits and returns
+    the new SRT as bytes. Cue numbers, text and anything after the timecodes are kept as-is; the
+    times of all cues are collected first so the edits run on whole arrays.
+    encoding: of the input stream and the output (default: detected from the stream; UTF-8 for text).
+    """
+    if isinstance(srt_source, str):
+        encoding = encoding or 'utf-8'
+        blocks = _iter_srt_text_blocks(srt_source)
+    else:
+        encoding = encoding or detect_stream_encoding(srt_source)
+        blocks = iter_srt_stream_blocks(srt_source, encoding)
+    cue_blocks = []  # (lines, timecode match) or (lines, None) for blocks without a timecode line
+    start_ms = array('q')
+    end_ms = array('q')
+    newline = '\n'
+
+    with profiling.stage('read_timecodes') as info:
+        for block in blocks:
+            if '\r\n' in block:
+                newline = '\r\n'
+            lines = block.strip('\r\n').splitlines()
+            match = SRT_TIMECODE_LINE_REGEX.match(lines[1]) if len(lines) >= 2 else None
+            if match:
+                start_ms.append(srt_timecode_to_ms(match.group(1)))
+                end_ms.append(srt_timecode_to_ms(match.group(2)))
+            cue_blocks.append((lines, match))
+        info['cues'] = len(start_ms)
+
+    with profiling.stage('apply_timing_edits', cues=len(start_ms)):
+        new_start, new_end = apply_timing_edits(start_ms, end_ms, **edits)
+        start_codes = iter(format_srt_timecodes(new_start))
+        end_codes = iter(format_srt_timecodes(new_end))
+
+    with profiling.stage('write_srt') as info:
+        output = []
+        for lines, match in cue_blocks:
+            if match:
+                timecode_line = lines[1]
+                lines[1] = (timecode_line[:match.start(1)] + next(start_codes) + ' --> '
+                            + next(end_codes) + timecode_line[match.end(2):])
+            output.append(newline.join(lines))
+        result = ((newline * 2).join(output) + newline).encode(encoding, errors=TEXT_ENCODE_ERRORS)
+        info['bytes'] = len(result)
+    return result
+
+TIMECODE_INPUT_REGEX = re.compile(r'\s*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{3})\s*')
+
+def parse_timecode(text):
+    """Parses a user-entered 'HH:MM:SS,mmm' (or '.mmm') timecode to ms; raises ValueError otherwise."""
+    match = TIMECODE_INPUT_REGEX.fullmatch(text)
+    if not match:
+        raise ValueError(f"Invalid timecode '{text}' (expected HH:MM:SS,mmm).")
+    hours, minutes, seconds, millis = map(int, match.groups())
+    return hours * 3600000 + minutes * 60000 + seconds * 1000 + millis
+
+# Static parts of the streamed .xlsx package (see rows_to_xlsx_bytes). Style 1 = header (bold), 2 = time cells.
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<numFmts count="1"><numFmt numFmtId="164" formatCode="{XLSX_TIME_FORMAT}"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+MS_PER_DAY = 86400000
+
+def xlsx_text_cell(reference, text, style=0):
+    """Inline-string cell (no shared string table, so nothing accumulates in memory)."""
+    text = xml_escape(XML_INVALID_CHARS_REGEX.sub('', str(text)))
+    reference_attr = f' r="{reference}"' if reference else ''
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c{reference_attr} t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+def xlsx_row_xml(row_number, start, end, speaker, dialogue):
+    """
+    <row> XML for one [Start, End, Speaker, Dialogue] row plus its typed time cells.
+    row_number=None leaves out the row/cell references (rows then follow in document order),
+    so the fragment can be reused at any position (see SrtRevisionTracker).
+    """
+    start_ms = srt_timecode_to_ms(start)
+    end_ms = srt_timecode_to_ms(end)
+    r = row_number
+    if r is None:
+        return (
+            '<row>'
+            + xlsx_text_cell(None, start) + xlsx_text_cell(None, end)
+            + xlsx_text_cell(None, speaker) + xlsx_text_cell(None, dialogue)
+            + f'<c s="2"><v>{start_ms / MS_PER_DAY!r}</v></c>'
+            + f'<c s="2"><v>{end_ms / MS_PER_DAY!r}</v></c>'
+            + f'<c s="2"><v>{(end_ms - start_ms) / MS_PER_DAY!r}</v></c>'
+            + '</row>'
+        )
+    return (
+        f'<row r="{r}">'
+        + xlsx_text_cell(f"A{r}", start) + xlsx_text_cell(f"B{r}", end)
+        + xlsx_text_cell(f"C{r}", speaker) + xlsx_text_cell(f"D{r}", dialogue)
+        + f'<c r="E{r}" s="2"><v>{start_ms / MS_PER_DAY!r}</v></c>'
+        + f'<c r="F{r}" s="2"><v>{end_ms / MS_PER_DAY!r}</v></c>'
+        + f'<c r="G{r}" s="2"><v>{(end_ms - start_ms) / MS_PER_DAY!r}</v></c>'
+        + '</row>'
+    )
+
+def write_xlsx_package(row_xml_chunks, count_key='rows'):
+    """
+    Streams row XML chunks (after the header row) straight into xl/worksheets/sheet1.xml of a
+    minimal .xlsx package (constant memory, no per-cell objects) and returns the .xlsx bytes.
+    """
+    output = io.BytesIO()
+    chunks = 0
+    with profiling.stage('write_xlsx', engine=XLSX_ENGINE_STREAMING) as info:
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as package:
+            for part_name, xml in XLSX_STATIC_PARTS.items():
+                package.writestr(part_name, xml)
+
+            with package.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+                header = ''.join(xlsx_text_cell(f"{chr(65 + i)}1", name, style=1)
+                                 for i, name in enumerate(SRT_COLUMNS + XLSX_TIME_COLUMNS))
+                sheet.write(f'{XLSX_SHEET_HEAD}<row r="1">{header}</row>'.encode('utf-8'))
+
+                for chunk in row_xml_chunks:
+                    chunks += 1
+                    sheet.write(chunk.encode('utf-8'))
+
+                sheet.write(XLSX_SHEET_TAIL.encode('utf-8'))
+        info[count_key] = chunks
+        info['bytes'] = output.tell()
+
+    return output.getvalue()
+
+def rows_to_xlsx_bytes(rows):
+    """
+    Streams [Start, End, Speaker, Dialogue] rows into a minimal .xlsx package (see write_xlsx_package)
+    and returns the .xlsx bytes.
+    Besides the original text columns, typed Excel time columns (Start Time, End Time, Duration)
+    are added so the sheet supports time arithmetic directly.
+    """
+    return write_xlsx_package(xlsx_row_xml(r, *row) for r, row in enumerate(rows, start=2))
+
+def srt_to_xlsx_bytes(srt_source, speaker_classifier=None, workers=None):
+    """SRT (text or binary stream) straight to .xlsx bytes, without building a DataFrame."""
+    return srt_to_export_bytes(srt_source, 'xlsx', speaker_classifier, workers)
+
+def dataframe_to_xlsx_bytes(df, engine=XLSX_ENGINE_STREAMING):
+    """Exports the parsed DataFrame to .xlsx bytes (clean data, no preview styling)."""
+    if engine == XLSX_ENGINE_STREAMING:
+        return rows_to_xlsx_bytes(df[SRT_COLUMNS].itertuples(index=False, name=None))
+
+    output = io.BytesIO()
+    with profiling.stage('to_excel', engine=XLSX_ENGINE_PANDAS, rows=len(df)) as info:
+        # FIX FOR CRASH: Save the original DataFrame (df_converted) instead of the Styler object
+        df[SRT_COLUMNS].to_excel(output, index=False, engine='openpyxl') 
+        info['bytes'] = output.tell()
+    return output.getvalue()
+
+# Analysis exports of the parsed rows: format -> (file extension, MIME type, label).
+# CSV and JSON Lines carry the DataFrame columns (text and integer ms timecodes); Parquet keeps
+# only the integer timecodes and stores the speakers dictionary-encoded.
+EXPORT_FORMATS = {
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', "Excel"),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet', "Parquet"),
+    'csv': ('.csv', 'text/csv', "CSV"),
+    'jsonl': ('.jsonl', 'application/x-ndjson', "JSON Lines"),
+}
+EXPORT_COLUMNS = SRT_COLUMNS + SRT_MS_COLUMNS
+PARQUET_COMPRESSION = 'zstd'
+
+def _iter_export_records(rows):
+    """[Start, End, Speaker, Dialogue] rows extended with their 'Start ms'/'End ms' values."""
+    last_start = last_end = None
+    start_ms = end_ms = 0
+    for start, end, speaker, dialogue in rows:
+        # Rows of one cue share their timecodes; only convert when they change
+        if start != last_start:
+            last_start, start_ms = start, srt_timecode_to_ms(start)
+        if end != last_end:
+            last_end, end_ms = end, srt_timecode_to_ms(end)
+        yield start, end, speaker, dialogue, start_ms, end_ms
+
+def rows_to_csv_bytes(rows):
+    """Streams [Start, End, Speaker, Dialogue] rows to UTF-8 CSV with the EXPORT_COLUMNS header."""
+    import csv
+
+    output = io.BytesIO()
+    with profiling.stage('write_csv') as info:
+        text_output = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        writer = csv.writer(text_output)
+        writer.writerow(EXPORT_COLUMNS)
+        writer.writerows(_iter_export_records(rows))
+        text_output.flush()
+        text_output.detach()
+        info['bytes'] = output.tell()
+    return output.getvalue()
+
+def rows_to_jsonl_bytes(rows):
+    """Streams [Start, End, Speaker, Dialogue] rows to JSON Lines: one object (EXPORT_COLUMNS keys) per row."""
+    import json
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    output = io.BytesIO()
+    with profiling.stage('write_jsonl') as info:
+        text_output = io.TextIOWrapper(output, encoding='utf-8', newline='\n')
+        text_output.writelines(encode(dict(zip(EXPORT_COLUMNS, record))) + '\n' for record in _iter_export_records(rows))
+        text_output.flush()
+        text_output.detach()
+        info['bytes'] = output.tell()
+    return output.getvalue()
+
+def cue_table_to_parquet_bytes(table):
+    """
+    Parquet file of a CueTable: int64 'Start ms'/'End ms', 'Speaker' dictionary-encoded straight
+    from the table's speaker IDs, and 'Dialogue'.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with profiling.stage('write_parquet', rows=len(table)) as info:
+        speaker_ids = np.frombuffer(table.speaker_ids, dtype=np.int32) if table.speaker_ids else np.empty(0, np.int32)
+        arrow_table = pa.table({
+            SRT_MS_COLUMNS[0]: pa.array(np.asarray(table.start_ms, dtype=np.int64)),
+            SRT_MS_COLUMNS[1]: pa.array(np.asarray(table.end_ms, dtype=np.int64)),
+            'Speaker': pa.DictionaryArray.from_arrays(pa.array(speaker_ids), pa.array(table.speakers, pa.string())),
+            'Dialogue': pa.array(table.dialogue, pa.string()),
+        })
+        sink = pa.BufferOutputStream()
+        pq.write_table(arrow_table, sink, compression=PARQUET_COMPRESSION)
+        data = sink.getvalue().to_pybytes()
+        info['bytes'] = len(data)
+    return data
+
+def rows_to_export_bytes(rows, export_format):
+    """[Start, End, Speaker, Dialogue] rows in one of the EXPORT_FORMATS (bytes)."""
+    if export_format == 'xlsx':
+        return rows_to_xlsx_bytes(rows)
+    if export_format == 'parquet':
+        return cue_table_to_parquet_bytes(CueTable.from_rows(rows))
+    if export_format == 'csv':
+        return rows_to_csv_bytes(rows)
+    if export_format == 'jsonl':
+        return rows_to_jsonl_bytes(rows)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+def srt_to_export_bytes(srt_source, export_format, speaker_classifier=None, workers=None):
+    """
+    SRT (text or binary stream) to one of the EXPORT_FORMATS without building a DataFrame; the row
+    formats stream straight from the tokenizer, Parquet is written from the columnar CueTable.
+    workers: parse a large input in that many processes first (see parse_srt_table_parallel).
+    """
+    if export_format == 'parquet':
+        return cue_table_to_parquet_bytes(parse_srt_table(srt_source, speaker_classifier, workers))
+    if workers and workers > 1:
+        rows = parse_srt_table_parallel(srt_source, speaker_classifier, workers).iter_rows()
+    else:
+        rows = iter_srt_rows(srt_source, speaker_classifier)
+    return rows_to_export_bytes(rows, export_format)
+
+def dataframe_to_export_bytes(df, export_format):
+    """Exports the parsed DataFrame in one of the EXPORT_FORMATS (clean data, no preview styling)."""
+    if export_format == 'xlsx':
+        return dataframe_to_xlsx_bytes(df)
+    return rows_to_export_bytes(df[SRT_COLUMNS].itertuples(index=False, name=None), export_format)
+
+# 2c. INCREMENTAL RE-EXPORT (revised uploads of the same SRT)
+class SrtRevisionTracker:
+    """
+    Parses successive revisions of an SRT, redoing the work only for cues that changed.
+    A cue is keyed by its content (timecode line and text; not the index line, so renumbering is
+    not a change) plus the parser state it starts from (carried-over speaker, same start as the
+    previous row), so the rows are exactly those of parse_srt. Its rows and .xlsx row XML are
+    reused from the previous revision when the key matches.
+    """
+
+    def __init__(self, speaker_classifier=None):
+        self._is_speaker = (speaker_classifier or DEFAULT_SPEAKER_CLASSIFIER).is_speaker
+        self._cues = {}  # cue key -> (rows, last_known_speaker after the cue, row XML)
+        self._contents = []  # cue contents of the last revision, in order
+        self._xml_chunks = []
+        self.revisions = 0
+
+    def update(self, srt_source):
+        """
+        Parses a revision (text or binary stream). Returns (CueTable, change report); the report
+        compares its cues with the previous revision (see revision_report).
+        """
+        is_speaker = self._is_speaker
+        previous_cues = self._cues
+        cues = {}
+        contents = []
+        xml_chunks = []
+        all_rows = []
+        reparsed = 0
+        last_known_speaker = "Unknown"
+        last_row_start = None
+
+        with profiling.stage('parse_srt_incremental') as info:
+            for block in _iter_srt_source_blocks(srt_source):
+                block = block.strip()
+                cue = _srt_block_cue(block)
+                if cue is None: continue
+                content_start, dialogue_start, time_start, time_end = cue
+                content = block[content_start:]
+
+                key = (content, last_known_speaker, last_row_start == time_start)
+                entry = cues.get(key) or previous_cues.get(key)
+                if entry is None:
+                    reparsed += 1
+                    rows, speaker_after, _, _ = _srt_cue_rows(
+                        block, dialogue_start, time_start, time_end, is_speaker, last_known_speaker, last_row_start
+                    )
+                    entry = (rows, speaker_after, ''.join(xlsx_row_xml(None, *row) for row in rows))
+                cues[key] = entry
+
+                rows, last_known_speaker, row_xml = entry
+                if rows:
+                    last_row_start = time_start
+                    all_rows.extend(rows)
+                contents.append(content)
+                xml_chunks.append(row_xml)
+            info['cues'] = len(contents)
+            info['reparsed'] = reparsed
+
+        report = revision_report(self._contents if self.revisions else None, contents)
+        report['reparsed'] = reparsed
+        self._cues, self._contents, self._xml_chunks = cues, contents, xml_chunks
+        self.revisions += 1
+        return CueTable.from_rows(all_rows), report
+
+    def xlsx_bytes(self):
+        """.xlsx of the last revision, assembled from the per-cue row XML (same cells as srt_to_xlsx_bytes)."""
+        return write_xlsx_package(self._xml_chunks, count_key='cues')
+
+def _cue_summary(content):
+    """(start timecode, first text line) of a cue's content, for change reports."""
+    lines = content.split('\n', 2)
+    return lines[0].strip()[:12], lines[1].strip() if len(lines) > 1 else ''
+
+def revision_report(old_contents, new_contents):
+    """
+    Cue-level change report between two revisions (lists of cue contents, see SrtRevisionTracker).
+    Returns counts (cues, unchanged, changed, added, removed) and a `changes` list of
+    {'change', 'cue' (number in its revision), 'start', 'text'}; old_contents=None means no previous revision.
+    """
+    import difflib
+
+    report = {'cues': len(new_contents), 'previous': old_contents is not None,
+              'unchanged': 0, 'changed': 0, 'added': 0, 'removed': 0, 'changes': []}
+    if old_contents is None:
+        report['added'] = len(new_contents)
+        return report
+
+    changes = report['changes']
+    matcher = difflib.SequenceMatcher(None, old_contents, new_contents, autojunk=False)
+    for tag, old_from, old_to, new_from, new_to in matcher.get_opcodes():
+        if tag == 'equal':
+            report['unchanged'] += old_to - old_from
+            continue
+        paired = min(old_to - old_from, new_to - new_from)
+        for offset in range(new_to - new_from):
+            change = 'changed' if offset < paired else 'added'
+            report[change] += 1
+            start, text = _cue_summary(new_contents[new_from + offset])
+            changes.append({'change': change, 'cue': new_from + offset + 1, 'start': start, 'text': text})
+        for offset in range(paired, old_to - old_from):
+            report['removed'] += 1
+            start, text = _cue_summary(old_contents[old_from + offset])
+            changes.append({'change': 'removed', 'cue': old_from + offset + 1, 'start': start, 'text': text})
+    return report
+
+# 2d. PARALLEL PARSE (one large SRT over several processes)
+# The input is placed once in shared memory and cut at blank lines into byte ranges; each worker
+# decodes and parses only its own range. A worker can't know the parser state its chunk starts
+# from, so it parses from the initial state and reports what the stitch needs to check that guess.
+# If it was wrong, only the chunk's head is parsed again: the cues up to the first tagged speaker
+# line, after which the parser state no longer depends on the state the chunk started from.
+PARALLEL_PARSE_MIN_CHUNK_BYTES = 4 * 1024 * 1024
+SRT_CHUNK_BOUNDARY_REGEX = re.compile(rb'\n[ \t\r\f\v]*\n')
+SRT_INITIAL_STATE = ("Unknown", None)  # (last_known_speaker, last_row_start) before the first cue
+
+def mp_context():
+    """
+    Start method for the toolkit's worker process pools (parallel parse, batch conversion):
+    'spawn' avoids forking the (multi-threaded) Streamlit server process.
+    """
+    import multiprocessing
+
+    return multiprocessing.get_context('spawn')
+
+def _srt_blocks_rows(blocks, is_speaker, last_known_speaker, last_row_start):
+    """Rows of a run of cue blocks parsed from the given state; returns (rows, last_known_speaker, last_row_start)."""
+    rows = []
+    for block in blocks:
+        block = block.strip()
+        cue = _srt_block_cue(block)
+        if cue is None: continue
+        _, dialogue_start, time_start, time_end = cue
+        cue_rows, last_known_speaker, last_row_start, _ = _srt_cue_rows(
+            block, dialogue_start, time_start, time_end, is_speaker, last_known_speaker, last_row_start
+        )
+        rows.extend(cue_rows)
+    return rows, last_known_speaker, last_row_start
+
+def srt_parallel_input(srt_source):
+    """
+    The whole SRT (text or binary stream) as (data, encoding, start) for the parallel parse: bytes in
+    an encoding where every b'\\n' is a line break (UTF-16 is transcoded to UTF-8), and the offset
+    of the text after a UTF-8 BOM.
+    """
+    if isinstance(srt_source, str):
+        return srt_source.encode('utf-8'), 'utf-8', 0
+    encoding = detect_stream_encoding(srt_source)
+    data = srt_source.read()
+    if encoding == 'utf-8-sig':
+        return data, 'utf-8', len(codecs.BOM_UTF8)
+    if encoding.startswith('utf-16'):
+        return data.decode(encoding, errors=TEXT_DECODE_ERRORS).encode('utf-8'), 'utf-8', 0
+    return data, encoding, 0
+
+def split_srt_chunks(data, start, end, chunks):
+    """
+    Up to `chunks` byte ranges of about equal size covering data[start:end], each cut just after a
+    blank line, so every cue block lies entirely inside one range.
+    """
+    bounds = [start]
+    step = (end - start) // max(chunks, 1)
+    for i in range(1, chunks):
+        match = SRT_CHUNK_BOUNDARY_REGEX.search(data, max(start + i * step, bounds[-1]), end)
+        if not match: break
+        if match.end() < end: bounds.append(match.end())
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+def _parse_srt_chunk(shared_name, start, end, encoding, non_speaker_phrases):
+    """
+    Worker entry point of parse_srt_table_parallel: parses bytes start:end of the shared input from
+    the initial parser state. Returns (head_blocks, head_table, tail_table, first_row_start, state):
+    the head is the cues up to and including the first one settled by a tagged line (head_blocks
+    is None when there is none - then the whole chunk is head), first_row_start the Start of its
+    first row and state the parser state after the chunk.
+    """
+    from multiprocessing import shared_memory
+
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try:
+        text = codecs.decode(shared.buf[start:end], encoding, TEXT_DECODE_ERRORS)
+    finally:
+        shared.close()
+
+    is_speaker = SpeakerClassifier(non_speaker_phrases).is_speaker
+    head_blocks, head_rows, tail_rows = [], [], []
+    rows = head_rows
+    last_known_speaker, last_row_start = SRT_INITIAL_STATE
+    first_row_start = None
+
+    for block in _iter_srt_text_blocks(text):
+        block = block.strip()
+        cue = _srt_block_cue(block)
+        if cue is None: continue
+        _, dialogue_start, time_start, time_end = cue
+
+        cue_rows, last_known_speaker, last_row_start, settled = _srt_cue_rows(
+            block, dialogue_start, time_start, time_end, is_speaker, last_known_speaker, last_row_start
+        )
+        rows.extend(cue_rows)
+        if rows is head_rows:
+            head_blocks.append(block)
+            if cue_rows and first_row_start is None:
+                first_row_start = time_start
+            if settled:
+                rows = tail_rows
+
+    return (head_blocks if rows is tail_rows else None, CueTable.from_rows(head_rows),
+            CueTable.from_rows(tail_rows), first_row_start, (last_known_speaker, last_row_start))
+
+def parse_srt_table_parallel(srt_source, speaker_classifier=None, workers=None,
+                             min_chunk_bytes=PARALLEL_PARSE_MIN_CHUNK_BYTES):
+    """
+    parse_srt's tokenizer over several worker processes for one large SRT (text or binary stream).
+    Returns the same CueTable as the serial parse; inputs with less than min_chunk_bytes per
+    worker are parsed serially.
+    """
+    from multiprocessing import shared_memory
+    from concurrent.futures import ProcessPoolExecutor
+
+    classifier = speaker_classifier or DEFAULT_SPEAKER_CLASSIFIER
+    workers = workers or os.cpu_count() or 1
+    data, encoding, text_start = srt_parallel_input(srt_source)
+    ranges = split_srt_chunks(data, text_start, len(data), min(workers, (len(data) - text_start) // min_chunk_bytes))
+
+    if len(ranges) < 2:
+        with profiling.stage('parse_srt') as info:
+            text = codecs.decode(data[text_start:], encoding, TEXT_DECODE_ERRORS)
+            table = CueTable.from_rows(iter_srt_rows(text, classifier))
+            info['rows'] = len(table)
+        return table
+
+    with profiling.stage('parse_srt_parallel', chunks=len(ranges), bytes=len(data)) as info:
+        shared = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shared.buf[:len(data)] = data
+            phrases = tuple(classifier.non_speaker_phrases)
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=mp_context()) as pool:
+                futures = [pool.submit(_parse_srt_chunk, shared.name, start, end, encoding, phrases)
+                           for start, end in ranges]
+
+                # Stitch in input order while later chunks are still being parsed
+                table = CueTable()
+                last_known_speaker, last_row_start = SRT_INITIAL_STATE
+                reparsed = 0
+                for (start, end), future in zip(ranges, futures):
+                    head_blocks, head_table, tail_table, first_row_start, state = future.result()
+                    guess_holds = (last_known_speaker == SRT_INITIAL_STATE[0]
+                                   and (last_row_start is None or last_row_start != first_row_start))
+                    if guess_holds:
+                        table.extend(head_table)
+                        table.extend(tail_table)
+                        # A chunk without rows leaves last_row_start as it was
+                        last_known_speaker = state[0]
+                        last_row_start = state[1] if state[1] is not None else last_row_start
+                        continue
+
+                    # Parsed from the wrong state: redo the head (the whole chunk if it never settles)
+                    reparsed += 1
+                    settled = head_blocks is not None
+                    if not settled:
+                        head_blocks = _iter_srt_text_blocks(codecs.decode(data[start:end], encoding, TEXT_DECODE_ERRORS))
+                    rows, last_known_speaker, last_row_start = _srt_blocks_rows(
+                        head_blocks, classifier.is_speaker, last_known_speaker, last_row_start
+                    )
+                    table.extend(CueTable.from_rows(rows))
+                    if settled:
+                        table.extend(tail_table)
+                        last_known_speaker, last_row_start = state
+        finally:
+            shared.close()
+            shared.unlink()
+        info['workers'] = min(workers, len(ranges))
+        info['rows'] = len(table)
+        info['reparsed_heads'] = reparsed
+    return table
+
+# 3. WORD SCRIPT FORMATTER (from word-editor-app-app.py)
+
+def set_default_text_formatting(doc):
+    """
+    Sets Times New Roman 12pt and specific Spacing (Before: 0pt, After: 6pt, Single Line) on the Normal style,
+    so every paragraph/run inherits it and only deviations (title, timecodes) need direct formatting.
+    """
+    from docx.shared import Pt
+    from docx.enum.text import WD_LINE_SPACING
+
+    normal_style = doc.styles['Normal']
+    normal_style.font.name = TARGET_FONT
+    normal_style.font.size = Pt(TARGET_SIZE)
+    
+    normal_style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE
+    normal_style.paragraph_format.space_before = Pt(0)
+    normal_style.paragraph_format.space_after = Pt(6)
+
+# Streaming .docx input: body paragraphs are read straight from the main document part with
+# iterparse instead of loading the whole python-docx object model.
+W_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY, W_P, W_R, W_HYPERLINK, W_T, W_BR = (
+    W_NAMESPACE + tag for tag in ('body', 'p', 'r', 'hyperlink', 't', 'br')
+)
+# Text equivalents of run content elements (same mapping as python-docx's Run.text)
+DOCX_RUN_CONTENT_TEXT = {
+    W_NAMESPACE + 'tab': '\t',
+    W_NAMESPACE + 'ptab': '\t',
+    W_NAMESPACE + 'cr': '\n',
+    W_NAMESPACE + 'noBreakHyphen': '-',
+}
+OFFICE_DOCUMENT_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+def docx_main_part_name(package):
+    """Zip member name of the main document part, resolved through _rels/.rels."""
+    from xml.etree import ElementTree
+
+    rels = ElementTree.fromstring(package.read('_rels/.rels'))
+    for rel in rels:
+        if rel.get('Type') == OFFICE_DOCUMENT_REL_TYPE:
+            return rel.get('Target').lstrip('/')
+    return 'word/document.xml'
+
+def docx_paragraph_text(paragraph):
+    """Text of a parsed w:p element, matching python-docx's Paragraph.text."""
+    parts = []
+    for child in paragraph:
+        if child.tag == W_R:
+            runs = (child,)
+        elif child.tag == W_HYPERLINK:
+            runs = child.iterfind(W_R)
+        else:
+            continue
+        for run in runs:
+            for item in run:
+                if item.tag == W_T:
+                    parts.append(item.text or '')
+                elif item.tag == W_BR:
+                    # Page/column breaks have no text equivalent
+                    if item.get(W_NAMESPACE + 'type', 'textWrapping') == 'textWrapping':
+                        parts.append('\n')
+                else:
+                    parts.append(DOCX_RUN_CONTENT_TEXT.get(item.tag, ''))
+    return ''.join(parts)
+
+def iter_docx_paragraph_texts(stream):
+    """
+    Yields the text of each body-level paragraph of a .docx binary stream, in order - the same
+    strings as [p.text for p in Document(stream).paragraphs] - while only one top-level body
+    element is held in memory at a time.
+    """
+    from xml.etree.ElementTree import iterparse
+
+    stream.seek(0)
+    with zipfile.ZipFile(stream) as package, package.open(docx_main_part_name(package)) as part:
+        depth = 0
+        body = None
+        for event, element in iterparse(part, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 2 and element.tag == W_BODY:
+                    body = element
+                continue
+            depth -= 1
+            if depth == 2 and body is not None:
+                # A direct child of w:body just finished: use it, then drop it
+                if element.tag == W_P:
+                    yield docx_paragraph_text(element)
+                body.clear()
+
+# One scan classifies a (stripped) script paragraph: SRT line number, timecode, or speaker line.
+# Same patterns as the former separate checks (index fullmatch, TIMECODE_REGEX, SPEAKER_REGEX).
+SCRIPT_PARAGRAPH_REGEX = re.compile(
+    r"(?P<index>\d+$)"
+    r"|(?P<timecode>\d{2}:\d{2}:\d{2},\d{3}\s+-->\s+\d{2}:\d{2}:\d{2},\d{3}$)"
+    r"|(?P<speaker>[A-Z][a-z\s&]+):\s*",
+    re.IGNORECASE
+)
+
+def add_script_styles(document):
+    """
+    Adds the Word formatter's reusable styles, so paragraphs and runs only reference a style:
+    'Timecode' (bold, no space after), 'Speaker' (1" hanging indent with a tab stop at 1"),
+    'Speaker Name' (bold) and 'Tag Emphasis' (bold italic, for <i>/<b>/<u> content).
+    Returns their style IDs in that order.
+    """
+    from docx.shared import Pt, Inches
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.enum.text import WD_TAB_ALIGNMENT
+
+    normal_style = document.styles['Normal']
+
+    timecode_style = document.styles.add_style('Timecode', WD_STYLE_TYPE.PARAGRAPH)
+    timecode_style.base_style = normal_style
+    timecode_style.font.bold = True
+    timecode_style.paragraph_format.space_after = Pt(0)
+
+    speaker_style = document.styles.add_style('Speaker', WD_STYLE_TYPE.PARAGRAPH)
+    speaker_style.base_style = normal_style
+    speaker_style.paragraph_format.left_indent = Inches(1.0)
+    speaker_style.paragraph_format.first_line_indent = Inches(-1.0)
+    speaker_style.paragraph_format.tab_stops.add_tab_stop(Inches(1.0), WD_TAB_ALIGNMENT.LEFT)
+
+    speaker_name_style = document.styles.add_style('Speaker Name', WD_STYLE_TYPE.CHARACTER)
+    speaker_name_style.font.bold = True
+
+    emphasis_style = document.styles.add_style('Tag Emphasis', WD_STYLE_TYPE.CHARACTER)
+    emphasis_style.font.bold = True
+    emphasis_style.font.italic = True
+
+    return timecode_style.style_id, speaker_style.style_id, speaker_name_style.style_id, emphasis_style.style_id
+
+def process_docx(uploaded_file, file_name_without_ext, color_allocator=None):
+    """
+    Performs original advanced document modifications and formatting on a DOCX input.
+    Speaker colors come from color_allocator (a fresh SpeakerColorAllocator per call by default).
+    """
+    
+    from copy import deepcopy
+    from docx import Document
+    from docx.oxml import OxmlElement
+    from docx.shared import Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.text.paragraph import Paragraph
+
+    if color_allocator is None:
+        color_allocator = SpeakerColorAllocator()
+    
+    document = Document()
+    
+    # General Font/Size and Spacing come from the Normal style (applied once, not per run);
+    # timecode/speaker layout comes from the script styles instead of per-paragraph formatting
+    set_default_text_formatting(document)
+    timecode_style_id, speaker_style_id, speaker_name_style_id, emphasis_style_id = add_script_styles(document)
+    
+    # --- A. Set Main Title (25pt, 2 blank lines after) ---
+    title_paragraph = document.add_paragraph(file_name_without_ext.upper())
+    title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    title_paragraph.paragraph_format.space_after = Pt(0) 
+    
+    title_run = title_paragraph.runs[0]
+    title_run.font.size = Pt(25) 
+    title_run.bold = True
+    
+    document.add_paragraph().paragraph_format.space_after = Pt(0)
+    document.add_paragraph().paragraph_format.space_after = Pt(0)
+
+    # --- B. Process raw paragraphs and add to new document ---
+    # The upload (any binary stream) is read paragraph by paragraph, not loaded as a second Document.
+    # Paragraphs are appended straight to the body (the section properties are put back last), as
+    # Document.add_paragraph searches the whole body for them on every call.
+    body = document.element.body
+    section_properties = body.sectPr
+    body.remove(section_properties)
+    document_body = document._body
+    speaker_run_properties = {}  # speaker name -> <w:rPr> ('Speaker Name' style + color), copied per run
+
+    def add_paragraph(style_id=None):
+        p = OxmlElement('w:p')
+        if style_id:
+            p.style = style_id
+        body.append(p)
+        return Paragraph(p, document_body)
+
+    with profiling.stage('read_and_format') as info:
+        paragraphs = 0
+        for raw_text in iter_docx_paragraph_texts(uploaded_file):
+            paragraphs += 1
+            text = raw_text.strip()
+            if not text:
+                continue
+
+            match = SCRIPT_PARAGRAPH_REGEX.match(text)
+            kind = match.lastgroup if match else None
+
+            # B.1 Remove SRT Line Numbers (from basic converters)
+            if kind == 'index':
+                continue
+
+            # B.2 Timecode ('Timecode' style: bold, Space After = 0)
+            if kind == 'timecode':
+                add_paragraph(timecode_style_id).add_run(text)
+                continue
+
+            # B.3 Content (Speaker/Content)
+            if kind == 'speaker':
+                # Hanging indent and tab stop come from the 'Speaker' style
+                new_paragraph = add_paragraph(speaker_style_id)
+
+                speaker_full = match.group(0)
+                speaker_name = match.group('speaker').strip()
+
+                run_properties = speaker_run_properties.get(speaker_name)
+                if run_properties is None:
+                    # Run for the speaker name (Bold via style, Font Color per speaker)
+                    template_run = new_paragraph.add_run()
+                    template_run._r.style = speaker_name_style_id
+                    template_run.font.color.rgb = color_allocator.get_color(speaker_name)
+                    run_properties = speaker_run_properties[speaker_name] = template_run._r.rPr
+                    new_paragraph._p.remove(template_run._r)
+
+                run_speaker = new_paragraph.add_run()
+                run_speaker._r.insert(0, deepcopy(run_properties))
+                run_speaker.text = speaker_full
+
+                # Insert Tab character
+                new_paragraph.add_run('\t')
+
+                current_text = text[len(speaker_full):]
+
+            else:
+                # No speaker -> No indent (Normal style has none)
+                new_paragraph = add_paragraph()
+                current_text = text
+
+            # --- B.4 Process HTML tags within the current_text ---
+
+            # Using the original (and potentially buggy) regex for fidelity to the original file
+            last_end = 0
+            has_tags = False
+
+            for tag_match in HTML_CONTENT_REGEX.finditer(current_text):
+                has_tags = True
+                start, end = tag_match.span()
+
+                # Add text BEFORE the tag (if any)
+                if start > last_end:
+                    new_paragraph.add_run(current_text[last_end:start])
+
+                # Add the HTML content ('Tag Emphasis' style: Bold and Italic)
+                new_paragraph.add_run(tag_match.group(2))._r.style = emphasis_style_id
+
+                last_end = end
+
+            # Add remaining text AFTER the last tag
+            if last_end < len(current_text):
+                new_paragraph.add_run(current_text[last_end:])
+
+            # Handle case with no tag and no speaker (plain text)
+            elif kind != 'speaker' and not has_tags:
+                new_paragraph.add_run(current_text)
+        info['paragraphs'] = paragraphs
+
+    body.append(section_properties)
+
+    with profiling.stage('save_document') as info:
+        modified_file = io.BytesIO()
+        document.save(modified_file)
+        info['bytes'] = modified_file.tell()
+    modified_file.seek(0)
+    
+    return modified_file
+
+
+
+
+# 4. CONVERSION DISPATCH (shared by the batch mode and the headless CLI)
+
+# kind -> (accepted input extension, UI label)
+CONVERSIONS = {
+    'srt_docx': ('.srt', "SRT to Word (Basic)"),
+    'srt_xlsx': ('.srt', "SRT to Excel (Analysis)"),
+    'docx_format': ('.docx', "Word Script Formatting"),
+    'srt_retime': ('.srt', "SRT Timing Fix (Shift / Scale / Resync)"),
+    'srt_parquet': ('.srt', "SRT to Parquet (Analysis)"),
+    'srt_csv': ('.srt', "SRT to CSV (Analysis)"),
+    'srt_jsonl': ('.srt', "SRT to JSON Lines (Analysis)"),
+}
+# SRT analysis conversions -> export format (see srt_to_export_bytes)
+ANALYSIS_CONVERSIONS = {'srt_xlsx': 'xlsx', 'srt_parquet': 'parquet', 'srt_csv': 'csv', 'srt_jsonl': 'jsonl'}
+
+def conversion_output_name(kind, file_name):
+    """Output file name for one input, matching the single-file pages."""
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    if kind == 'srt_docx':
+        return f"CONVERTED_{base}.docx"
+    if kind in ANALYSIS_CONVERSIONS:
+        return f"{base}_DATA{EXPORT_FORMATS[ANALYSIS_CONVERSIONS[kind]][0]}"
+    if kind == 'srt_retime':
+        return f"RETIMED_{base}.srt"
+    return f"FORMATTED_{os.path.basename(file_name)}"
+
+def unique_output_name(output_name, used_names):
+    """
+    output_name, or 'name (2).ext', 'name (3).ext', ... if already in used_names (which it is added to),
+    so several inputs sharing a base name don't overwrite each other's output.
+    """
+    unique_name, counter = output_name, 2
+    while unique_name in used_names:
+        stem, ext = os.path.splitext(output_name)
+        unique_name = f"{stem} ({counter}){ext}"
+        counter += 1
+    used_names.add(unique_name)
+    return unique_name
+
+def convert(kind, source, file_name, **options):
+    """
+    Runs one conversion on a binary stream and returns (output_name, output_bytes).
+    For SRT inputs, options may include timing={...} (apply_timing_edits keywords) to retime first.
+    """
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    timing = options.pop('timing', None) or {}
+    if timing and (kind == 'srt_docx' or kind in ANALYSIS_CONVERSIONS):
+        source = io.BytesIO(retime_srt(source, **timing))
+
+    if kind == 'srt_docx':
+        result = process_srt_to_docx(source, base, **options).getvalue()
+    elif kind in ANALYSIS_CONVERSIONS:
+        result = srt_to_export_bytes(source, ANALYSIS_CONVERSIONS[kind], **options)
+    elif kind == 'docx_format':
+        result = process_docx(source, base, **options).getvalue()
+    elif kind == 'srt_retime':
+        result = retime_srt(source, **timing)
+    else:
+        raise ValueError(f"Unknown conversion: {kind}")
+
+    return conversion_output_name(kind, file_name), result
@@ -0,0 +1,159 @@
+"""
+Background conversion jobs: long conversions run in a worker thread pool instead of the Streamlit
+script thread. Each job has an ID, reports progress (input consumed, cues when known) and can be
+cancelled; finished jobs keep their result so a rerun (or another click) can pick it up.
+"""
+import io
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import artifacts
+import profiling
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+DEFAULT_JOB_WORKERS = 2
+MAX_FINISHED_JOBS = 32
+
+class JobCancelled(Exception):
+    """Raised inside a running conversion once its job has been cancelled."""
+
+class ProgressStream(io.BytesIO):
+    """
+    In-memory input that reports how far the conversion has read into it and aborts the read once
+    the job is cancelled. The pipelines stream their input, so this tracks their progress without
+    any hook inside the conversion loops.
+    by_position: progress is the stream position (sequential readers such as the SRT pipelines,
+    which rewind after sniffing the encoding from the head); otherwise it is the bytes consumed
+    (zip readers seek to the central directory first).
+    """
+
+    def __init__(self, data, job, by_position=False):
+        super().__init__(data)
+        self._job = job
+        self._size = len(data) or 1
+        self._by_position = by_position
+        self._bytes_read = 0
+
+    def _report(self, chunk):
+        if self._job.cancel_requested:
+            raise JobCancelled()
+        self._bytes_read += len(chunk)
+        consumed = self.tell() if self._by_position else self._bytes_read
+        self._job.progress = min(1.0, consumed / self._size)
+        return chunk
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        position = super().seek(offset, whence)
+        if self._by_position:
+            self._job.progress = min(1.0, position / self._size)
+        return position
+
+    def read(self, size=-1):
+        return self._report(super().read(size))
+
+    def read1(self, size=-1):
+        return self._report(super().read1(size))
+
+class Job:
+    """One queued conversion and its outcome (result = (output_name, bytes) when done)."""
+
+    def __init__(self, kind, file_name, key=None, cues_total=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.file_name = file_name
+        self.key = key
+        self.cues_total = cues_total
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.run = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in JOB_FINISHED_STATES
+
+    @property
+    def cues_done(self):
+        """Approximate cues processed (input read so far), or None if the total is unknown."""
+        return round(self.progress * self.cues_total) if self.cues_total else None
+
+    def cancel(self):
+        self._cancel.set()
+
+class JobQueue:
+    """
+    Thread-pool job runner shared by all sessions. Jobs with the same key are reused while they are
+    pending or done, so resubmitting is free; callers put their session in the key (with the upload
+    digest, kind and options), so one user cancelling a job never cancels another user's conversion.
+    """
+
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='conversion-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+
+    def submit(self, kind, file_name, data, key=None, profile=False, **options):
+        """
+        Queues convert(kind, ...) (through the artifact cache) on a copy-free stream over data and returns its Job.
+        profile: run the conversion under cProfile (job.run.profile_bytes / profile_summary).
+        """
+        with self._lock:
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and job.status not in (JOB_FAILED, JOB_CANCELLED):
+                        return job
+            cues_total = data.count(b'-->') if kind.startswith('srt_') else None
+            job = Job(kind, file_name, key, cues_total or None)
+            self._jobs[job.id] = job
+            self._evict_finished()
+        self._pool.submit(self._run, job, data, profile, options)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, data, profile, options):
+        if job.cancel_requested:
+            job.status, job.finished_at = JOB_CANCELLED, time.time()
+            return
+        job.status = JOB_RUNNING
+        try:
+            with profiling.record(job.kind, profile=profile, file=job.file_name, job=job.id) as run:
+                job.run = run
+                source = ProgressStream(data, job, by_position=job.kind.startswith('srt_'))
+                job.result = artifacts.cached_convert(
+                    job.kind, source, job.file_name, digest=hashlib.sha256(data).hexdigest(), **options
+                )
+            job.progress = 1.0
+            job.status = JOB_DONE
+        except JobCancelled:
+            job.status = JOB_CANCELLED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = JOB_FAILED
+        job.finished_at = time.time()
@@ -0,0 +1,133 @@
+"""
+Per-stage instrumentation for the conversion pipelines.
+
+The core wraps each pipeline stage in `stage(...)`. Nothing is recorded unless a caller opened a
+`record(...)` block around the conversion; then every stage's wall time, RSS delta and counts
+(cues, rows, paragraphs, bytes) are collected, logged as one JSON line per stage on the
+'subtitle_toolkit' logger, and - with profile=True - a cProfile dump of the whole run is kept.
+"""
+import io
+import os
+import sys
+import json
+import time
+import marshal
+import logging
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+logger = logging.getLogger('subtitle_toolkit')
+
+# Environment variable: directory where every recorded run also writes its .prof file
+PROFILE_DIR_ENV = 'TOOLKIT_PROFILE_DIR'
+PROFILE_SUMMARY_LINES = 30
+
+_current_run = ContextVar('subtitle_toolkit_run', default=None)
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc; peak RSS elsewhere, 0 if unavailable)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class PipelineRun:
+    """Stage records of one conversion run (see record())."""
+
+    def __init__(self, pipeline, **context):
+        self.pipeline = pipeline
+        self.context = context
+        self.stages = []
+        self.seconds = 0.0
+        self.profile_bytes = None
+        self.profile_summary = None
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """Times one stage; counts can be added to the yielded dict while it runs."""
+        info = dict(counts)
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.stages.append({
+                'stage': name,
+                'seconds': round(time.perf_counter() - started, 6),
+                'rss_delta_mib': round((current_rss_bytes() - rss_before) / 2**20, 2),
+                **info,
+            })
+
+    def log(self):
+        if not self.stages:
+            return
+        for stage in self.stages:
+            logger.info(json.dumps({'pipeline': self.pipeline, **self.context, **stage}, default=str))
+        logger.info(json.dumps({'pipeline': self.pipeline, **self.context, 'stage': 'total',
+                                'seconds': round(self.seconds, 6)}, default=str))
+
+def stage(name, **counts):
+    """Stage context for the active record() block; a no-op (yielding a scratch dict) otherwise."""
+    run = _current_run.get()
+    if run is None:
+        return nullcontext(dict(counts))
+    return run.stage(name, **counts)
+
+@contextmanager
+def record(pipeline, profile=False, profile_dir=None, **context):
+    """
+    Records the stages run inside the block and yields the PipelineRun.
+    profile: also run cProfile over the block (run.profile_bytes / run.profile_summary);
+    profile_dir (default: $TOOLKIT_PROFILE_DIR) additionally writes the dump to <dir>/<pipeline>-<time>.prof.
+    """
+    profile_dir = profile_dir or os.environ.get(PROFILE_DIR_ENV)
+    run = PipelineRun(pipeline, **context)
+    token = _current_run.set(run)
+    profiler = None
+    if profile or profile_dir:
+        import cProfile
+        profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield run
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        run.seconds = time.perf_counter() - started
+        _current_run.reset(token)
+        if profiler is not None:
+            save_profile(run, profiler, profile_dir)
+        run.log()
+
+def save_profile(run, profiler, profile_dir=None):
+    """Stores the cProfile result on the run (pstats-compatible bytes and a text summary)."""
+    import pstats
+
+    profiler.create_stats()
+    run.profile_bytes = marshal.dumps(profiler.stats)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    run.profile_summary = summary.getvalue()
+
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"{run.pipeline}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        with open(path, 'wb') as dump:
+            dump.write(run.profile_bytes)
+        logger.info(json.dumps({'pipeline': run.pipeline, 'profile': path}))
+
+def configure_logging(level=logging.INFO):
+    """Sends the structured stage lines to stderr (CLI --diagnostics); safe to call repeatedly."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(level)
@@ -0,0 +1,252 @@
+"""
+Parity corpus for the single-pass SRT tokenizer and tag cleanup: parse_srt must produce exactly the
+rows of the original split-cascade parser, and clean_dialogue_text the text of the original regex
+cascade (both frozen below). Speaker classification is shared with the core.
+
+Run with: python -m pytest -q tests
+"""
+import io
+import os
+import re
+import sys
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import (
+    clean_dialogue_text, dataframe_to_export_bytes, is_valid_speaker_tag, iter_srt_rows, parse_srt,
+    srt_to_export_bytes,
+)
+
+COLUMNS = ['Start', 'End', 'Speaker', 'Dialogue']
+
+def baseline_clean_dialogue_text(text):
+    """The original clean_dialogue_text (one substitution per tag name, then any tag removed)."""
+    text = re.sub(r'<i[^>]*>(.*?)</i[^>]*>', r'(\1)', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<b[^>]*>(.*?)</b[^>]*>', r'(\1)', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<u[^>]*>(.*?)</u[^>]*>', r'(\1)', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<[^>]*>', '', text, flags=re.DOTALL)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def baseline_parse_srt_rows(srt_content):
+    """The original parse_srt (before the single-pass tokenizer), returning its rows as lists."""
+    data = []
+    blocks = re.split(r'\n\s*\n', srt_content.strip())
+    last_known_speaker = "Unknown"
+
+    def append_row_and_update_state(speaker, dialogue):
+        nonlocal last_known_speaker
+        data.append([time_start, time_end, speaker, baseline_clean_dialogue_text(dialogue)])
+        last_known_speaker = speaker
+
+    for block in blocks:
+        lines = block.strip().split('\n')
+        if len(lines) < 3: continue
+
+        time_line = lines[1].strip()
+        time_match = re.match(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})', time_line)
+        if not time_match: continue
+
+        time_start = time_match.group(1)
+        time_end = time_match.group(2)
+
+        dialogue_lines = lines[2:]
+        current_dialogue = ""
+        block_initial_speaker = last_known_speaker
+
+        for line in dialogue_lines:
+            line = line.strip()
+            if not line: continue
+
+            segments = re.split(r'((?:[\w\s&]+?): )', line)
+
+            i = 0
+            while i < len(segments):
+                segment = segments[i].strip()
+                i += 1
+
+                if not segment: continue
+
+                if segment.endswith(':') and len(segment) > 1:
+                    speaker_tag = segment[:-1].strip()
+
+                    if is_valid_speaker_tag(speaker_tag):
+
+                        if current_dialogue:
+                            speaker_to_use = block_initial_speaker if not data or data[-1][0] != time_start else last_known_speaker
+                            append_row_and_update_state(speaker_to_use, current_dialogue)
+                            current_dialogue = ""
+
+                        speaker = speaker_tag
+                        dialogue_segment = segments[i].strip() if i < len(segments) else ""
+                        i += 1
+
+                        if dialogue_segment:
+                            append_row_and_update_state(speaker, dialogue_segment)
+
+                        if block_initial_speaker == last_known_speaker:
+                            block_initial_speaker = speaker
+
+                    else:
+                        dialogue_segment = segments[i].strip() if i < len(segments) else ""
+                        i += 1
+                        recombined_text = segment + " " + dialogue_segment
+
+                        if current_dialogue: current_dialogue += " " + recombined_text
+                        else: current_dialogue = recombined_text
+
+                else:
+                    if current_dialogue: current_dialogue += " " + segment
+                    else: current_dialogue = segment
+
+        if current_dialogue:
+            speaker_to_use = block_initial_speaker if not data or data[-1][0] != time_start else last_known_speaker
+            append_row_and_update_state(speaker_to_use, current_dialogue)
+
+    return data
+
+
+# --- CORPUS ---
+
+CORPUS = {
+    'basic': (
+        "1\n00:00:01,000 --> 00:00:02,000\nJOHN: Hello there.\n\n"
+        "2\n00:00:02,500 --> 00:00:04,000\nAnd how are you?\n"
+    ),
+    'crlf': (
+        "1\r\n00:00:01,000 --> 00:00:02,000\r\nMARY: First line.\r\nSecond line.\r\n\r\n"
+        "2\r\n00:00:03,000 --> 00:00:04,000\r\nTOM: Reply.\r\n"
+    ),
+    'whitespace_only_separators': (
+        "1\n00:00:01,000 --> 00:00:02,000\nJOHN: One.\n \n"
+        "2\n00:00:02,000 --> 00:00:03,000\nTwo.\n\t\n \n"
+        "3\n00:00:03,000 --> 00:00:04,000\nMARY: Three.\n"
+    ),
+    'multi_speaker_lines': (
+        "1\n00:00:01,000 --> 00:00:03,000\nJOHN: Are you coming? MARY: Not yet. Tom & Jerry: Wait!\n"
+        "Dr Smith: Everyone calm down.\n\n"
+        "2\n00:00:03,000 --> 00:00:05,000\nsome trailing words\nMike and Sue: Together.\n"
+    ),
+    'non_speaker_tags': (
+        "1\n00:00:01,000 --> 00:00:02,000\nNote: this is not a speaker.\n\n"
+        "2\n00:00:02,000 --> 00:00:03,000\nthe only problem: it rained. JOHN: Still fun.\n\n"
+        "3\n00:00:03,000 --> 00:00:04,000\nhere we go: again\nUpdate: nothing new\n"
+    ),
+    'timecode_leading_space': (
+        "1\n   00:00:01,000 --> 00:00:02,000\nJOHN: Indented timecode.\n\n"
+        "2\n\t00:00:02,000 --> 00:00:03,000 X1:10 Y1:20\nStill parsed.\n"
+    ),
+    'formatting_tags': (
+        "1\n00:00:01,000 --> 00:00:02,000\n<i>JOHN: Whispering</i> <b>loud</b>\n\n"
+        "2\n00:00:02,000 --> 00:00:03,000\n<font color=\"#ff0\">MARY:</font> <u>under</u> <i>open\n"
+    ),
+    'malformed_blocks': (
+        "garbage before\n\n"
+        "1\n00:00:01,000 --> 00:00:02,000\n\n"
+        "2\nnot a timecode\nJOHN: skipped\n\n"
+        "3\n00:00:03,000 --> 00:00:04,000\nJOHN: kept\n\n"
+        "4\n00:00:05,000 --> 00:00:06,000\n"
+    ),
+    'out_of_range_timecodes': (
+        "1\n00:00:60,200 --> 00:01:75,000\nJOHN: Kept as written.\n\n"
+        "2\n00:99:59,999 --> 01:00:00,000\nMARY: Also kept.\n"
+    ),
+    'literal_angle_brackets': (
+        "1\n00:00:01,000 --> 00:00:02,000\nI <3 you <i>so</i> much\n\n"
+        "2\n00:00:02,000 --> 00:00:03,000\nScore: 3 < 4 <i>wow</i>\n"
+    ),
+    'nested_tags': (
+        "1\n00:00:01,000 --> 00:00:02,000\n<i><i>b c</i></i> <b><i>both</i></b>\n\n"
+        "2\n00:00:02,000 --> 00:00:03,000\n<i>a<b>c</i>d</b> </i>stray<I>open\n"
+    ),
+    'empty': "",
+}
+
+# Dialogue lines for the direct clean_dialogue_text comparison
+DIALOGUE_TAG_CASES = [
+    "plain text", "  spaced \t out  ", "I <3 you <i>so</i> much", "Score: 3 < 4 <i>wow</i>",
+    "<i><i>b c</i></i>", "<i>a<b>c</i>d</b>", "<b><i>x</i></b> <u>y", "</i>x<i>y", "<I>up</I> <B>big</b>",
+    '<font color="#ffff00">yellow</font> <i class="x">styled</i>', "<u>one</u> <u>two</u> <u>three",
+    "<i>multi\nline</i>", "<b></b>empty pair",
+]
+
+SPEAKER_TAGS = ["JOHN", "MARY", "Tom & Jerry", "Dr Smith", "Mike and Sue", "Contestant 1", "A", "x"]
+NON_SPEAKER_TAGS = ["Note", "the only problem", "here we go", "Update", "lowercase tag",
+                    "A very long tag that is certainly not a speaker name"]
+WORDS = "the a we just said okay so now then right here look wait come on you know maybe".split()
+SEPARATORS = ["\n\n", "\n \n", "\n\t\n", "\n\n\n", "\n \t \n"]
+
+def random_line(rng):
+    parts = []
+    for _ in range(rng.randint(1, 3)):
+        roll = rng.random()
+        if roll < 0.4:
+            parts.append(rng.choice(SPEAKER_TAGS) + ": ")
+        elif roll < 0.55:
+            parts.append(rng.choice(NON_SPEAKER_TAGS) + ": ")
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 5)))
+        if rng.random() < 0.2:
+            tag = rng.choice("ibu")
+            words = f"<{tag}>{words}</{tag}>"
+        parts.append(words)
+    line = "".join(parts)
+    return (" " * rng.randint(0, 2)) + line + (" " * rng.randint(0, 2))
+
+def random_srt(seed):
+    """A random, partly malformed SRT text (CRLF, odd separators, broken or indented timecodes)."""
+    rng = random.Random(seed)
+    blocks = []
+    ms = 0
+    for index in range(1, rng.randint(1, 12)):
+        start, ms = ms, ms + rng.randint(200, 4000)
+        timecode = (f"{start // 3600000:02d}:{start // 60000 % 60:02d}:{start // 1000 % 60:02d},{start % 1000:03d} --> "
+                    f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}")
+        roll = rng.random()
+        if roll < 0.1:
+            timecode = " " + timecode
+        elif roll < 0.15:
+            timecode = timecode.replace(',', '.')
+        lines = [str(index), timecode] + [random_line(rng) for _ in range(rng.randint(0, 3))]
+        blocks.append("\n".join(lines))
+    text = "".join(block + rng.choice(SEPARATORS) for block in blocks)
+    if rng.random() < 0.3:
+        text = text.replace("\n", "\r\n")
+    return text
+
+RANDOM_SEEDS = range(500)
+
+
+# --- PARITY CHECKS ---
+
+@pytest.mark.parametrize('text', DIALOGUE_TAG_CASES)
+def test_clean_dialogue_text_matches_baseline(text):
+    assert clean_dialogue_text(text) == baseline_clean_dialogue_text(text)
+
+def dataframe_rows(df):
+    return [[start, end, str(speaker), dialogue] for start, end, speaker, dialogue in df[COLUMNS].itertuples(index=False)]
+
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_corpus_matches_baseline(name):
+    text = CORPUS[name]
+    expected = baseline_parse_srt_rows(text)
+    assert list(iter_srt_rows(text)) == expected
+    assert dataframe_rows(parse_srt(text)) == expected
+
+@pytest.mark.parametrize('name', sorted(CORPUS))
+def test_corpus_stream_matches_baseline(name):
+    text = CORPUS[name]
+    assert dataframe_rows(parse_srt(io.BytesIO(text.encode('utf-8')))) == baseline_parse_srt_rows(text)
+
+def test_random_corpus_matches_baseline():
+    for seed in RANDOM_SEEDS:
+        text = random_srt(seed)
+        expected = baseline_parse_srt_rows(text)
+        assert list(iter_srt_rows(text)) == expected, f"seed {seed}"
+        assert dataframe_rows(parse_srt(io.BytesIO(text.encode('utf-8')))) == expected, f"seed {seed}"
+
+@pytest.mark.parametrize('export_format', ['csv', 'jsonl'])
+def test_streaming_and_dataframe_exports_agree(export_format):
+    text = CORPUS['out_of_range_timecodes'] + "\n" + random_srt(7)
+    assert srt_to_export_bytes(text, export_format) == dataframe_to_export_bytes(parse_srt(text), export_format)
@@ -0,0 +1,43 @@
+"""
+Encoding round-trips of the SRT pipelines: bytes read through the cp1252 fallback decoding must be
+written back unchanged, also when they only appear after the encoding detection sample.
+
+Run with: python -m pytest -q tests
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import SRT_ENCODING_SAMPLE_BYTES, convert, detect_stream_encoding, retime_srt
+
+CP1252_UNDEFINED = b'\x81\x8d\x8f\x90\x9d'
+
+def cp1252_srt_with_late_undefined_bytes():
+    """A cp1252 SRT ('é' in the head) whose cp1252-undefined bytes come after the detection sample."""
+    cue = "{index}\r\n00:00:{second:02d},000 --> 00:00:{second:02d},500\r\nJOSÉ: café\r\n\r\n"
+    blocks = []
+    size = 0
+    index = 1
+    while size <= SRT_ENCODING_SAMPLE_BYTES:
+        block = cue.format(index=index, second=index % 60).encode('cp1252')
+        blocks.append(block)
+        size += len(block)
+        index += 1
+    blocks.append(f"{index}\r\n00:00:01,000 --> 00:00:02,000\r\nODD: ".encode('cp1252') + CP1252_UNDEFINED + b"\r\n")
+    return b''.join(blocks)
+
+def test_retime_keeps_cp1252_undefined_bytes_after_sample():
+    data = cp1252_srt_with_late_undefined_bytes()
+    assert detect_stream_encoding(io.BytesIO(data)) == 'cp1252'
+
+    result = retime_srt(io.BytesIO(data), offset_ms=1000)
+    assert result.endswith(b"00:00:02,000 --> 00:00:03,000\r\nODD: " + CP1252_UNDEFINED + b"\r\n")
+    assert retime_srt(io.BytesIO(data)) == data
+
+def test_converting_with_timing_accepts_cp1252_undefined_bytes():
+    data = cp1252_srt_with_late_undefined_bytes()
+    for kind in ('srt_xlsx', 'srt_docx', 'srt_retime'):
+        _, output = convert(kind, io.BytesIO(data), 'late.srt', timing={'offset_ms': 500})
+        assert output